@@ -0,0 +1,180 @@
+"""Almacén binario de solo lectura con los agregados, el cubo y la geometría del tablero.
+
+Un solo archivo (info/almacen.bin) con un encabezado JSON y, alineados a 64
+bytes, los arreglos de cada columna. Cada proceso lo abre con mmap en modo
+lectura y arma los DataFrame como vistas sobre el mapa, sin copiar ni
+parsear: todos los workers de gunicorn comparten las mismas páginas del
+caché del sistema, y abrirlo cuesta lo que cuesta mapear el archivo.
+
+Las columnas de texto se guardan como códigos enteros más su lista de
+valores; al abrirlas como categóricas (categoricas=True) también los códigos
+son vistas sobre el mapa, en lugar de millones de objetos str por proceso.
+"""
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+import cache
+
+FIRMA = b"MORTALM1"
+VERSION_ALMACEN = 1
+ALINEACION = 64
+
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
+
+
+def _tipo_codigos(n):
+    # El mismo tipo que pandas usa para los códigos de una categórica con n categorías
+    for tipo in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+
+def _columnas(df):
+    """(descripción, arreglos) de cada columna, en el formato del almacén."""
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object or isinstance(serie.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+            ordenada = isinstance(serie.dtype, pd.CategoricalDtype) and serie.cat.ordered
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+            else:
+                codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+            valores = np.asarray(valores, dtype=object).tolist()
+            descripcion = {"nombre": col, "tipo": "texto", "valores": valores, "ordenada": bool(ordenada),
+                           "categorica": isinstance(serie.dtype, pd.CategoricalDtype)}
+            yield descripcion, {"datos": np.asarray(codigos).astype(_tipo_codigos(len(valores)))}
+        elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+            yield ({"nombre": col, "tipo": "nulable", "dtype": str(serie.dtype)},
+                   {"datos": serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0),
+                    "nulos": serie.isna().to_numpy()})
+        else:
+            yield {"nombre": col, "tipo": "numerico"}, {"datos": np.ascontiguousarray(serie.to_numpy())}
+
+
+def guardar_almacen(ruta, marcos, blobs=None, extra=None):
+    """Escribe `marcos` (nombre -> DataFrame) y `blobs` (nombre -> bytes) en `ruta`.
+
+    El índice de cada DataFrame (si no es un RangeIndex) se guarda como
+    columnas y se restaura al abrirlo. La escritura es atómica.
+    """
+    encabezado = {"version": VERSION_ALMACEN, "marcos": {}, "blobs": {}}
+    encabezado.update(extra or {})
+    trozos = []
+    posicion = 0
+
+    def reservar(arreglo):
+        nonlocal posicion
+        posicion = _alinear(posicion)
+        trozos.append((posicion, arreglo))
+        ubicacion = {"offset": posicion, "dtype": arreglo.dtype.str, "cuenta": int(arreglo.size)}
+        posicion += arreglo.nbytes
+        return ubicacion
+
+    for nombre, df in marcos.items():
+        indice = None
+        if not isinstance(df.index, pd.RangeIndex):
+            indice = [n for n in df.index.names]
+            df = df.reset_index()
+        columnas = []
+        for descripcion, arreglos in _columnas(df):
+            descripcion.update({clave: reservar(arreglo) for clave, arreglo in arreglos.items()})
+            columnas.append(descripcion)
+        encabezado["marcos"][nombre] = {"filas": len(df), "indice": indice, "columnas": columnas}
+    for nombre, contenido in (blobs or {}).items():
+        encabezado["blobs"][nombre] = reservar(np.frombuffer(contenido, dtype=np.uint8))
+
+    texto = json.dumps(encabezado, ensure_ascii=False).encode("utf-8")
+    inicio = _alinear(len(FIRMA) + 8 + len(texto))
+    tmp = ruta + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(FIRMA + struct.pack("<Q", len(texto)) + texto)
+        for offset, arreglo in trozos:
+            f.seek(inicio + offset)
+            f.write(arreglo.tobytes())
+        f.truncate(inicio + _alinear(posicion))
+    os.replace(tmp, ruta)
+    return ruta
+
+
+class Almacen:
+    """Almacén abierto con mmap de solo lectura; marco() y blob() devuelven vistas."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:len(FIRMA)] != FIRMA:
+            raise ValueError(f"{ruta} no es un almacén del tablero")
+        (largo,) = struct.unpack_from("<Q", self._mapa, len(FIRMA))
+        inicio_texto = len(FIRMA) + 8
+        self.encabezado = json.loads(self._mapa[inicio_texto:inicio_texto + largo].decode("utf-8"))
+        if self.encabezado.get("version") != VERSION_ALMACEN:
+            raise ValueError(f"{ruta} tiene una versión de almacén distinta")
+        self._inicio = _alinear(inicio_texto + largo)
+
+    def __contains__(self, nombre):
+        return nombre in self.encabezado["marcos"] or nombre in self.encabezado["blobs"]
+
+    def _arreglo(self, ubicacion):
+        return np.frombuffer(self._mapa, dtype=np.dtype(ubicacion["dtype"]), count=ubicacion["cuenta"],
+                             offset=self._inicio + ubicacion["offset"])
+
+    def marco(self, nombre, categoricas=False):
+        """DataFrame guardado como `nombre`, con sus columnas como vistas sobre el mapa.
+
+        Las columnas que eran texto (object) vuelven como object, salvo con
+        categoricas=True; las que ya eran categóricas vuelven siempre así.
+        """
+        meta = self.encabezado["marcos"][nombre]
+        datos = {}
+        for col in meta["columnas"]:
+            arreglo = self._arreglo(col["datos"])
+            if col["tipo"] == "texto":
+                categorica = pd.Categorical.from_codes(
+                    arreglo, categories=col["valores"], ordered=col["ordenada"], validate=False)
+                datos[col["nombre"]] = categorica if categoricas or col["categorica"] else np.asarray(categorica)
+            elif col["tipo"] == "nulable":
+                tipo = pd.api.types.pandas_dtype(col["dtype"])
+                datos[col["nombre"]] = tipo.construct_array_type()(arreglo, self._arreglo(col["nulos"]))
+            else:
+                datos[col["nombre"]] = arreglo
+        df = pd.DataFrame(datos, copy=False)
+        if meta["indice"]:
+            df = df.set_index(meta["indice"])
+        return df
+
+    def blob(self, nombre):
+        return memoryview(self._arreglo(self.encabezado["blobs"][nombre]))
+
+    def json(self, nombre):
+        return json.loads(bytes(self.blob(nombre)))
+
+    def vigente(self, rutas):
+        """True si los archivos `rutas` no cambiaron desde que se escribió el almacén."""
+        huellas = self.encabezado.get("huellas", {})
+        for ruta in rutas:
+            anterior = huellas.get(os.path.basename(ruta))
+            if anterior is None or not os.path.exists(ruta):
+                return False
+            if cache.huella_archivo(ruta, anterior)["sha1"] != anterior["sha1"]:
+                return False
+        return True
+
+
+def abrir(ruta, rutas_vigilar=()):
+    """Almacén de `ruta` si existe y sigue al día con `rutas_vigilar`; si no, None."""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        almacen = Almacen(ruta)
+    except ValueError:
+        return None
+    return almacen if almacen.vigente(rutas_vigilar) else None
@@ -1,155 +1,380 @@
+import time
+_inicio_arranque = time.perf_counter()
+
 import json
 import pandas as pd
 import plotly.express as px
-from dash import Dash, dcc, html, dash_table
+from dash import Dash, dcc, html, dash_table, Input, Output, State, ctx, no_update
+import functools
 import os
 
-# --- Cargar datos ---
-df = pd.read_csv("info/mapa.csv", sep='|',encoding='latin1')
-lineal1 = pd.read_csv("info/lineal.csv", sep='|',encoding='latin1')
-df_ciudades = pd.read_csv("info/df_ciudades.csv", sep='|',encoding='latin1')
-circular = pd.read_csv("info/circular.csv", sep='|',encoding='latin1')
-apiladas = pd.read_csv("info/apiladas.csv", sep='|',encoding='latin1')
-histogra = pd.read_csv("info/histogra.csv", sep='|',encoding='latin1')
-tablita = pd.read_csv("info/tablita.csv", sep='|',encoding='latin1')
+import almacen
+import base_sqlite
+import cache
+import geometria
+import mapa_municipal
+import metricas
+import process
+import respuestas
+import tabla_causas
+
+# --- Cargar datos (generados con python construir.py) ---
+SALIDAS_APP = ["mapa", "lineal", "df_ciudades", "circular", "apiladas", "histogra", "tablita"]
+# Geometría simplificada (python geometria.py) al nivel que corresponde al zoom inicial
+ZOOM_INICIAL = 5
+NIVEL_INICIAL = geometria.nivel_para_zoom(ZOOM_INICIAL)
+ruta_geojson = geometria.ruta_nivel(NIVEL_INICIAL)
+# Entradas de cada caché LRU de figuras (una por worker)
+TAMANO_CACHE_FIGURAS = int(os.environ.get("TAMANO_CACHE_FIGURAS", "256"))
+
+# Almacén mapeado en memoria (info/almacen.bin): con gunicorn --preload todos los workers
+# comparten sus páginas. Si falta o algún CSV o geojson cambió después, se usan los archivos.
+rutas_municipios = {nivel: geometria.ruta_nivel(nivel, "municipios") for nivel in geometria.NIVELES_MUNICIPIOS}
+datos_almacen = almacen.abrir("info/almacen.bin", [f"info/{archivo}.csv" for archivo in SALIDAS_APP]
+                              + [ruta for ruta in [ruta_geojson, *rutas_municipios.values()] if os.path.exists(ruta)])
+
+def cargar_salida(archivo):
+    if datos_almacen is not None:
+        return datos_almacen.marco(f"salida:{archivo}")
+    # Artefacto binario info/<archivo>.marco si corresponde al CSV; si no, el CSV
+    return cache.leer_salida(f"info/{archivo}.csv",
+                             lambda ruta: pd.read_csv(ruta, sep='|', encoding='latin1'))
+
+df = cargar_salida("mapa")
+lineal1 = cargar_salida("lineal")
+df_ciudades = cargar_salida("df_ciudades")
+circular = cargar_salida("circular")
+apiladas = cargar_salida("apiladas")
+histogra = cargar_salida("histogra")
+tablita = cargar_salida("tablita")
+
+# --- Cubo precalculado para los filtros (construir.py lo escribe en info/cubo) ---
+RUTA_CUBO = "info/cubo"
+# Con BASE_SQLITE (python base_sqlite.py) las consultas filtradas van a SQLite y el cubo no se carga
+RUTA_SQLITE = os.environ.get("BASE_SQLITE")
+base = None
+if RUTA_SQLITE:
+    base = base_sqlite.BaseSQLite(RUTA_SQLITE)
+    cubo, dimensiones = None, base.dimensiones()
+elif datos_almacen is not None:
+    # cod_muerte como categórica: sus códigos también quedan en el mapa compartido
+    cubo = datos_almacen.marco("cubo", categoricas=True)
+    dimensiones = {nombre: datos_almacen.marco(f"dimension:{nombre}")
+                   for nombre in process.CLAVES_DIMENSIONES if f"dimension:{nombre}" in datos_almacen}
+elif os.path.isdir(RUTA_CUBO):
+    cubo, dimensiones = process.cargar_cubo(RUTA_CUBO)
+else:
+    # Sin cubo el tablero muestra los CSV de info/ y los filtros quedan deshabilitados
+    cubo, dimensiones = None, None
+hay_filtros = cubo is not None or base is not None
 
 # --- GeoJSON ---
-with open("departamentos_colombia.geojson", "r", encoding="utf-8") as f:
-    geojson = json.load(f)
+if datos_almacen is not None and f"geo:{NIVEL_INICIAL}" in datos_almacen:
+    geojson = datos_almacen.json(f"geo:{NIVEL_INICIAL}")
+else:
+    if not os.path.exists(ruta_geojson):
+        ruta_geojson = geometria.ORIGEN
+    with open(ruta_geojson, "r", encoding="utf-8") as f:
+        geojson = json.load(f)
+
+# --- GeoJSON municipal (opcional: python geometria.py municipios) ---
+def leer_municipios(nivel):
+    if datos_almacen is not None and f"geo:municipios_{nivel}" in datos_almacen:
+        return datos_almacen.json(f"geo:municipios_{nivel}")
+    if not os.path.exists(rutas_municipios[nivel]):
+        return None
+    with open(rutas_municipios[nivel], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# Los totales por municipio salen del cubo o de SQLite: sin ellos no hay mapa municipal
+municipal = mapa_municipal.MapaMunicipal.cargar(leer_municipios) if hay_filtros else None
 
 # --- Mapa ---
-fig_mapa = px.choropleth_mapbox(
-    df,
-    geojson=geojson,
-    locations="departamento",
-    featureidkey="properties.name",
-    color="cantidad_muertes",
-    mapbox_style="open-street-map",
-    zoom=5,
-    color_continuous_scale="Blues",
-    center={"lat": 4.5, "lon": -74.1},
-    title="Distribución total de muertes por departamento en Colombia (2019)"
-)
-fig_mapa.update_layout(
-    title_x=0.5,
-    margin={"r": 0, "t": 50, "l": 0, "b": 0},
-    paper_bgcolor="#e6f2ff"  # Fondo pastel azul
-)
+anios_mapa = sorted(int(anio) for anio in df["anio"].unique())
+
+@metricas.instrumentar()
+def figura_mapa(datos, anio):
+    """Mapa coroplético de las muertes por departamento en el año pedido."""
+    fig = px.choropleth_mapbox(
+        datos[datos["anio"] == anio],
+        geojson=geojson,
+        locations="departamento",
+        featureidkey="properties.name",
+        color="cantidad_muertes",
+        mapbox_style="open-street-map",
+        zoom=ZOOM_INICIAL,
+        color_continuous_scale="Blues",
+        center={"lat": 4.5, "lon": -74.1},
+        title=f"Distribución total de muertes por departamento en Colombia ({anio})"
+    )
+    fig.update_layout(
+        title_x=0.5,
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        paper_bgcolor="#e6f2ff"  # Fondo pastel azul
+    )
+    return fig
+
+ANIO_INICIAL = anios_mapa[-1]
+PERIODO = str(anios_mapa[0]) if len(anios_mapa) == 1 else f"{anios_mapa[0]}-{anios_mapa[-1]}"
+
+def clave_anio(anio):
+    # Con un solo año cargado (o sin cubo) el año no cambia los datos filtrables
+    return (int(anio),) if hay_filtros and len(anios_mapa) > 1 and anio is not None else None
+
+fig_mapa = figura_mapa(df, ANIO_INICIAL)
+
+# --- Mapa municipal: solo los polígonos de la vista, al detalle del zoom ---
+@functools.lru_cache(maxsize=int(os.environ.get("TAMANO_CACHE_MUNICIPIOS", "128")))
+def recorte_municipios(nivel, caja):
+    """Municipios de la caja al nivel pedido; se reutiliza al cambiar los filtros."""
+    return municipal.recorte(caja, nivel)
+
+@functools.lru_cache(maxsize=int(os.environ.get("TAMANO_CACHE_TOTALES_MUNICIPIOS", "64")))
+def totales_municipales(departamentos, sexos, meses, edades, anios):
+    """Muertes por código DIVIPOLA de 5 dígitos para una selección de filtros."""
+    if base is not None:
+        por_municipio = base.totales_por_municipio(departamentos, sexos, meses, edades, anios)
+    else:
+        seleccion = process.filtrar_cubo(cubo, departamentos, sexos, meses, edades, anios)
+        por_municipio = process.proyectar(seleccion, ["cod_departamento", "cod_municipio"]).dropna()
+    codigos = mapa_municipal.codigo_divipola(por_municipio["cod_departamento"], por_municipio["cod_municipio"])
+    return pd.Series(por_municipio["total"].to_numpy(), index=codigos)
+
+@metricas.instrumentar()
+def figura_municipios(totales, codigos, geojson_vista):
+    datos = pd.DataFrame({
+        "codigo": codigos,
+        "municipio": [municipal.nombres[codigo] for codigo in codigos],
+        "total_muertes": totales.reindex(list(codigos), fill_value=0).to_numpy()})
+    fig = px.choropleth_mapbox(
+        datos,
+        geojson=geojson_vista,
+        locations="codigo",
+        featureidkey="properties.codigo",
+        color="total_muertes",
+        hover_name="municipio",
+        # La escala es la del país completo: no cambia al mover el mapa
+        range_color=(0, max(int(totales.max()) if len(totales) else 0, 1)),
+        mapbox_style="open-street-map",
+        zoom=mapa_municipal.VISTA_INICIAL["zoom"],
+        center=mapa_municipal.VISTA_INICIAL["centro"],
+        color_continuous_scale="Blues",
+        title="Distribución de muertes por municipio"
+    )
+    fig.update_layout(
+        title_x=0.5,
+        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+        paper_bgcolor="#e6f2ff",  # Fondo pastel azul
+        uirevision="municipios"  # Las figuras nuevas no mueven la vista del usuario
+    )
+    return fig
+
+@functools.lru_cache(maxsize=TAMANO_CACHE_FIGURAS)
+def figura_municipios_vista(caja, nivel, departamentos, sexos, meses, edades, anios):
+    codigos, geojson_vista = recorte_municipios(nivel, caja)
+    totales = totales_municipales(departamentos, sexos, meses, edades, anios)
+    return figura_municipios(totales, codigos, geojson_vista).to_plotly_json()
+
+if municipal is not None:
+    caja_inicial = mapa_municipal.caja_centro(mapa_municipal.VISTA_INICIAL["centro"], mapa_municipal.VISTA_INICIAL["zoom"])
+    fig_municipios = figura_municipios_vista(mapa_municipal.ampliar(caja_inicial),
+                                             municipal.nivel(mapa_municipal.VISTA_INICIAL["zoom"]),
+                                             None, None, None, None, clave_anio(ANIO_INICIAL))
 
 # --- Gráfico de líneas ---
-fig_lineal = px.line(
-    lineal1,
-    x="mes",
-    y="total_muertes",
-    markers=True,
-    title="Tendencia mensual de muertes",
-    line_shape="linear",
-    color_discrete_sequence=["#0d47a1"]
-)
-fig_lineal.update_traces(line=dict(width=4), marker=dict(size=10, color="#1565c0"))
-fig_lineal.update_layout(
-    xaxis_title="Mes",
-    yaxis_title="Total de muertes",
-    title_x=0.5,
-    paper_bgcolor="#e6f2ff",  # Fondo pastel azul
-    plot_bgcolor="#ffffff"
-)
+@metricas.instrumentar()
+def figura_lineal(datos):
+    fig = px.line(
+        datos,
+        x="mes",
+        y="total_muertes",
+        markers=True,
+        title="Tendencia mensual de muertes",
+        line_shape="linear",
+        color_discrete_sequence=["#0d47a1"]
+    )
+    fig.update_traces(line=dict(width=4), marker=dict(size=10, color="#1565c0"))
+    fig.update_layout(
+        xaxis_title="Mes",
+        yaxis_title="Total de muertes",
+        title_x=0.5,
+        paper_bgcolor="#e6f2ff",  # Fondo pastel azul
+        plot_bgcolor="#ffffff"
+    )
+    return fig
+
+fig_lineal = figura_lineal(lineal1)
 
 # --- Gráfico de barras ---
-fig_barras = px.bar(
-    df_ciudades.sort_values(by="total_homicidios", ascending=False),
-    x="municipio",
-    y="total_homicidios",
-    text="total_homicidios",
-    color="total_homicidios",
-    color_continuous_scale="Blues",
-    title="Ciudades más violentas"
-)
-fig_barras.update_traces(textposition='outside')
-fig_barras.update_layout(
-    xaxis_title="Municipio",
-    yaxis_title="Total de homicidios",
-    title_x=0.5,
-    paper_bgcolor="#e6f2ff",  # Fondo pastel azul
-    plot_bgcolor="#ffffff"
-)
+@metricas.instrumentar()
+def figura_barras(datos):
+    fig = px.bar(
+        datos.sort_values(by="total_homicidios", ascending=False),
+        x="municipio",
+        y="total_homicidios",
+        text="total_homicidios",
+        color="total_homicidios",
+        color_continuous_scale="Blues",
+        title="Ciudades más violentas"
+    )
+    fig.update_traces(textposition='outside')
+    fig.update_layout(
+        xaxis_title="Municipio",
+        yaxis_title="Total de homicidios",
+        title_x=0.5,
+        paper_bgcolor="#e6f2ff",  # Fondo pastel azul
+        plot_bgcolor="#ffffff"
+    )
+    return fig
+
+fig_barras = figura_barras(df_ciudades)
+
+# --- Ranking de municipios por causa (índice CIE-10 y selección parcial) ---
+@metricas.instrumentar()
+def figura_ranking(datos, titulo):
+    fig = px.bar(
+        datos,
+        x="municipio",
+        y="total",
+        text="total",
+        color="total",
+        color_continuous_scale="Blues",
+        title=titulo
+    )
+    fig.update_traces(textposition='outside')
+    fig.update_layout(
+        xaxis_title="Municipio",
+        yaxis_title="Total de muertes",
+        title_x=0.5,
+        paper_bgcolor="#e6f2ff",  # Fondo pastel azul
+        plot_bgcolor="#ffffff"
+    )
+    return fig
+
+@functools.lru_cache(maxsize=TAMANO_CACHE_FIGURAS)
+def figura_ranking_filtrada(prefijo, capitulo, k, mayores, departamentos, sexos, meses, edades, anios):
+    if base is not None:
+        datos = base.ranking_municipios(prefijo, capitulo, k, mayores, departamentos, sexos, meses, edades, anios)
+    else:
+        mascara = process.mascara_cubo(cubo, departamentos, sexos, meses, edades, anios)
+        datos = process.ranking_municipios(cubo, dimensiones, prefijo, capitulo, k, mayores, mascara)
+    if capitulo:
+        causa = f"capítulo {capitulo} ({process.CAPITULOS_CIE10[capitulo][2]})"
+    else:
+        causa = f"códigos {prefijo}*" if prefijo else "todas las causas"
+    sentido = "más" if mayores else "menos"
+    return figura_ranking(datos, f"{k} municipios con {sentido} muertes: {causa}").to_plotly_json()
 
 # --- Circular ---
-fig_circular = px.pie(
-    circular,
-    names="municipio",
-    values="total_muertes",
-    title="Ciudades con menor índice de mortalidad",
-    color_discrete_sequence=px.colors.sequential.Blues
-)
-fig_circular.update_traces(textposition='inside', textinfo='percent+label')
-fig_circular.update_layout(
-    title_x=0.5,
-    paper_bgcolor="#e6f2ff"  # Fondo pastel azul
-)
+@metricas.instrumentar()
+def figura_circular(datos):
+    fig = px.pie(
+        datos,
+        names="municipio",
+        values="total_muertes",
+        title="Ciudades con menor índice de mortalidad",
+        color_discrete_sequence=px.colors.sequential.Blues
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(
+        title_x=0.5,
+        paper_bgcolor="#e6f2ff"  # Fondo pastel azul
+    )
+    return fig
+
+fig_circular = figura_circular(circular)
 
 # --- Barras apiladas ---
-fig_apiladas = px.bar(
-    apiladas,
-    x="departamento",
-    y="total_muertes",
-    color="sexo",
-    title="Muertes por Departamento y Sexo",
-    text="total_muertes",
-    color_discrete_sequence=px.colors.sequential.Blues
-)
-fig_apiladas.update_traces(textposition='inside')
-fig_apiladas.update_layout(
-    barmode="stack",
-    title_x=0.5,
-    paper_bgcolor="#e6f2ff",  # Fondo pastel azul
-    plot_bgcolor="#ffffff"
-)
+@metricas.instrumentar()
+def figura_apiladas(datos):
+    fig = px.bar(
+        datos,
+        x="departamento",
+        y="total_muertes",
+        color="sexo",
+        title="Muertes por Departamento y Sexo",
+        text="total_muertes",
+        color_discrete_sequence=px.colors.sequential.Blues
+    )
+    fig.update_traces(textposition='inside')
+    fig.update_layout(
+        barmode="stack",
+        title_x=0.5,
+        paper_bgcolor="#e6f2ff",  # Fondo pastel azul
+        plot_bgcolor="#ffffff"
+    )
+    return fig
+
+fig_apiladas = figura_apiladas(apiladas)
 
 # --- Histograma AJUSTADO ---
-# Ordenar por la columna de categoría para mantener el orden lógico
-histogra_ordenado = histogra.sort_values('categoria_edad')
-
-fig_histograma = px.bar(
-    histogra_ordenado,
-    x="rango_edad",
-    y="total_muertes",
-    text="total_muertes",
-    color="total_muertes",
-    color_continuous_scale="Blues",
-    title="Distribución de muertes por grupo de edad",
-    category_orders={"rango_edad": [
-        "60 a 84 años",
-        "85 a 100+ años", 
-        "45 a 59 años",
-        "30 a 44 años",
-        "20 a 29 años",
-        "Menor de 1 mes",
-        "15 a 19 años",
-        "1 a 11 meses",
-        "5 a 14 años",
-        "1 a 4 años",
-        "Sin información"
-    ]}
-)
-fig_histograma.update_traces(textposition="outside")
-fig_histograma.update_layout(
-    title_x=0.5,
-    paper_bgcolor="#e6f2ff",  # Fondo pastel azul
-    plot_bgcolor="#ffffff",
-    xaxis_title="Rango de Edad",
-    yaxis_title="Total de Muertes",
-    xaxis_tickangle=-45  # Rotar etiquetas para mejor legibilidad
-)
+# process.histograma() entrega las filas en el orden del ciclo de vida (categoría ordenada)
+@metricas.instrumentar()
+def figura_histograma(datos):
+    fig = px.bar(
+        datos,
+        x="rango_edad",
+        y="total_muertes",
+        text="total_muertes",
+        color="total_muertes",
+        color_continuous_scale="Blues",
+        title="Distribución de muertes por grupo de edad"
+    )
+    fig.update_traces(textposition="outside")
+    fig.update_layout(
+        title_x=0.5,
+        paper_bgcolor="#e6f2ff",  # Fondo pastel azul
+        plot_bgcolor="#ffffff",
+        xaxis_title="Rango de Edad",
+        yaxis_title="Total de Muertes",
+        xaxis_tickangle=-45  # Rotar etiquetas para mejor legibilidad
+    )
+    return fig
+
+fig_histograma = figura_histograma(histogra)
+
+# --- Tabla de causas: catálogo CIE-10 completo, paginado en el servidor ---
+if hay_filtros:
+    catalogo_causas = tabla_causas.catalogo(dimensiones)
+else:
+    # Sin cubo solo están las causas de tablita.csv
+    catalogo_causas = pd.DataFrame({
+        "codigo": tablita["cod_muerte"].astype(str),
+        "descripcion": tablita["descripcion__de_codigos_mortalidad_a_tres_caracteres"],
+        "nivel": 3, "padre": None})
+tabla = tabla_causas.TablaCausas(catalogo_causas)
+TAMANO_CACHE_TABLA = int(os.environ.get("TAMANO_CACHE_TABLA", "64"))
+
+@functools.lru_cache(maxsize=TAMANO_CACHE_TABLA)
+@metricas.instrumentar()
+def vista_tabla(departamentos, sexos, meses, edades, anios):
+    """Totales del catálogo y sus órdenes para una selección de filtros (una vez por selección)."""
+    if base is not None:
+        por_codigo = base.totales_por_causa(departamentos, sexos, meses, edades, anios)
+    elif cubo is None:
+        por_codigo = tablita.set_index(tablita["cod_muerte"].astype(str))["total_casos"]
+    else:
+        seleccion = process.filtrar_cubo(cubo, departamentos, sexos, meses, edades, anios)
+        por_codigo = process.proyectar(seleccion, ["cod_muerte"]).dropna().set_index("cod_muerte")["total"]
+    totales = tabla.totales(por_codigo)
+    return totales, tabla.ordenes(totales)
+
+filas_iniciales, paginas_iniciales = tabla.pagina(*vista_tabla(None, None, None, None, clave_anio(ANIO_INICIAL)))
 
-# --- Tabla ---
 tabla_dash = dash_table.DataTable(
-    columns=[
-        {"name": "Código de Muerte", "id": "cod_muerte"},
-        {"name": "Descripción de códigos mortalidad (3 caracteres)", "id": "descripcion__de_codigos_mortalidad_a_tres_caracteres"},
-        {"name": "Total de casos", "id": "total_casos"}
-    ],
-    data=tablita.to_dict("records"),
+    id="tabla-causas",
+    columns=tabla_causas.COLUMNAS,
+    data=filas_iniciales,
+    # Paginación, orden y filtro en el servidor: el navegador solo recibe la página visible
+    page_action="custom",
+    page_current=0,
+    page_size=10,
+    page_count=paginas_iniciales,
+    sort_action="custom",
+    sort_mode="single",
+    sort_by=tabla_causas.ORDEN_INICIAL,
+    filter_action="custom",
+    filter_query="",
     style_table={
         "overflowX": "auto",
         "border": "1px solid #ccc",
@@ -171,30 +396,142 @@ tabla_dash = dash_table.DataTable(
         "height": "auto",
         "backgroundColor": "#f8fbff"
     },
-    page_size=10
+    style_cell_conditional=[{"if": {"column_id": "codigo"}, "cursor": "pointer",
+                             "textDecoration": "underline", "color": "#0d47a1"}],
 )
 
+ranking = html.Div([
+    html.Div([
+        html.Label("Prefijo CIE-10", style={"fontWeight": "bold", "color": "#0d47a1"}),
+        dcc.Input(id="ranking-prefijo", type="text", value="X95", debounce=True,
+                  disabled=not hay_filtros, style={"width": "100%"})
+    ], style={"width": "18%", "display": "inline-block", "padding": "0 1%"}),
+    html.Div([
+        html.Label("Capítulo", style={"fontWeight": "bold", "color": "#0d47a1"}),
+        dcc.Dropdown(id="ranking-capitulo", disabled=not hay_filtros, placeholder="Usar el prefijo",
+                     options=[{"label": f"{c} - {nombre} ({desde}-{hasta})", "value": c}
+                              for c, (desde, hasta, nombre) in process.CAPITULOS_CIE10.items()])
+    ], style={"width": "38%", "display": "inline-block", "padding": "0 1%"}),
+    html.Div([
+        html.Label("Municipios", style={"fontWeight": "bold", "color": "#0d47a1"}),
+        dcc.Input(id="ranking-k", type="number", min=1, max=50, value=5, disabled=not hay_filtros,
+                  style={"width": "100%"})
+    ], style={"width": "10%", "display": "inline-block", "padding": "0 1%"}),
+    html.Div([
+        dcc.RadioItems(id="ranking-sentido", value="mayores",
+                       options=[{"label": " Más muertes", "value": "mayores"},
+                                {"label": " Menos muertes", "value": "menores"}])
+    ], style={"width": "20%", "display": "inline-block", "padding": "0 1%"}),
+    dcc.Graph(id="grafico-ranking", figure=fig_barras, style={"height": "60vh"})
+])
+
+# --- Filtros ---
+NOMBRES_SEXO = {1: "Hombre", 2: "Mujer", 3: "Indeterminado"}
+NOMBRES_MES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+               "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+if hay_filtros:
+    opciones_departamento = [
+        {"label": nombre.title(), "value": int(codigo)}
+        for codigo, nombre in dimensiones["departamentos"]["departamento"].sort_values().items()]
+else:
+    opciones_departamento = []
+
+def filtro(id_filtro, etiqueta, opciones):
+    return html.Div([
+        html.Label(etiqueta, style={"fontWeight": "bold", "color": "#0d47a1"}),
+        dcc.Dropdown(id=id_filtro, options=opciones, multi=True, disabled=not hay_filtros,
+                     placeholder="Todos")
+    ], style={"width": "20%", "display": "inline-block", "padding": "0 1%"})
+
+filtros = html.Div([
+    html.Div([
+        html.Label("Año", style={"fontWeight": "bold", "color": "#0d47a1"}),
+        dcc.Dropdown(id="filtro-anio", options=[{"label": str(anio), "value": anio} for anio in anios_mapa],
+                     value=ANIO_INICIAL, clearable=False)
+    ], style={"width": "10%", "display": "inline-block", "padding": "0 1%"}),
+    filtro("filtro-departamento", "Departamento", opciones_departamento),
+    filtro("filtro-sexo", "Sexo", [{"label": v, "value": k} for k, v in NOMBRES_SEXO.items()]),
+    filtro("filtro-mes", "Mes", [{"label": v, "value": i} for i, v in enumerate(NOMBRES_MES, start=1)]),
+    filtro("filtro-edad", "Grupo de edad", process.CATEGORIAS_EDAD),
+], style={"marginBottom": "10px"})
+
+# --- Figuras filtradas con caché LRU ---
+def datos_filtrados(nombres, departamentos, sexos, meses, edades, anios):
+    """Agregados `nombres` para una selección de filtros."""
+    if base is not None:
+        return {nombre: base.agregado(nombre, departamentos, sexos, meses, edades, anios) for nombre in nombres}
+    if cubo is None:
+        estaticos = {"data_mapa": df, "grafico_lineal": lineal1, "grafico_barras": df_ciudades,
+                     "grafico_circular": circular, "grafico_apiladas": apiladas,
+                     "histograma": histogra}
+        return {nombre: estaticos[nombre] for nombre in nombres}
+    seleccion = process.filtrar_cubo(cubo, departamentos, sexos, meses, edades, anios)
+    return {nombre: process.AGREGADOS[nombre](seleccion, dimensiones) for nombre in nombres}
+
+@functools.lru_cache(maxsize=TAMANO_CACHE_FIGURAS)
+@metricas.instrumentar()
+def mapa_filtrado(anio, departamentos, sexos, meses, edades):
+    """Mapa del año pedido en JSON, sin el GeoJSON: cada entrada de la caché no guarda su copia."""
+    datos = datos_filtrados(["data_mapa"], departamentos, sexos, meses, edades, clave_anio(anio))
+    figura = figura_mapa(datos["data_mapa"], anio).to_plotly_json()
+    for traza in figura["data"]:
+        del traza["geojson"]
+    return figura
+
+def figura_mapa_filtrada(anio, departamentos, sexos, meses, edades):
+    """Mapa del año pedido; aparte de las demás figuras para que cambiar de año solo rehaga el mapa."""
+    figura = mapa_filtrado(anio, departamentos, sexos, meses, edades)
+    # Copias superficiales: la entrada de la caché no se toca y el GeoJSON es el del módulo
+    return {**figura, "data": [{**traza, "geojson": geojson} for traza in figura["data"]]}
+
+@functools.lru_cache(maxsize=TAMANO_CACHE_FIGURAS)
+@metricas.instrumentar()
+def figuras_filtradas(anios, departamentos, sexos, meses, edades):
+    """Figuras (sin el mapa) para una combinación de filtros, ya convertidas a JSON.
+
+    `anios` es clave_anio(anio): None cuando el año no cambia los datos, así
+    que con un solo año cargado cambiar de año no vacía la caché. Las
+    llamadas repetidas salen de la caché (figuras_filtradas.cache_info() da
+    los aciertos y fallos); la memoria queda acotada por TAMANO_CACHE_FIGURAS.
+    """
+    # La tabla tiene su propio callback (vista_tabla) y el mapa el suyo (figura_mapa_filtrada)
+    datos = datos_filtrados(["grafico_lineal", "grafico_barras", "grafico_circular",
+                             "grafico_apiladas", "histograma"], departamentos, sexos, meses, edades, anios)
+    figuras = [
+        figura_lineal(datos["grafico_lineal"]),
+        figura_barras(datos["grafico_barras"]),
+        figura_circular(datos["grafico_circular"]),
+        figura_apiladas(datos["grafico_apiladas"]),
+        figura_histograma(datos["histograma"]),
+    ]
+    return tuple(fig.to_plotly_json() for fig in figuras)
+
+def clave_filtro(valores):
+    # Misma clave para la misma selección, sin importar el orden
+    return tuple(sorted(valores)) if valores else None
+
 # --- Textos descriptivos personalizables ---
-texto_mapa = """Mapa coroplético que muestra la distribución geográfica de muertes por departamento en Colombia (2019). 
+texto_mapa = """Mapa coroplético que muestra la distribución geográfica de muertes por departamento en Colombia en el año seleccionado.
 
 CARACTERÍSTICAS:
 • Tonos oscuros = Mayor concentración de casos
 • Tonos claros = Menor concentración de casos
 
-DEPARTAMENTOS CON MAYOR MORTALIDAD:
+DEPARTAMENTOS CON MAYOR MORTALIDAD (2019):
 • Bogotá D.C.: más de 38,000 muertes
 • Antioquia: 34,473 muertes  
 • Valle del Cauca: 28,443 muertes
 
 Los departamentos con menor densidad poblacional (Vaupés, Guainía, Amazonas) registran las cifras más bajas."""
 
-texto_lineal = """El gráfico de líneas muestra la variación mensual en el número de muertes durante 2019. Se observan fluctuaciones a lo largo del año,
+texto_lineal = """El gráfico de líneas muestra la variación mensual en el número de muertes durante el año seleccionado. Se observan fluctuaciones a lo largo del año,
  con ciertos picos que pueden asociarse a factores estacionales, climáticos o coyunturales. Este tipo de análisis permite detectar tendencias
    temporales que podrían orientar acciones preventivas o de salud pública."""
 texto_barras = """Esta visualización presenta las cinco ciudades con mayor número de homicidios, considerando los códigos de causa X95 (agresión con
  disparo de arma de fuego) y casos no especificados. El gráfico permite identificar los principales focos de violencia letal en el país, mostrando 
  contrastes claros entre zonas urbanas y regiones intermedias, y resaltando la importancia de políticas de seguridad diferenciadas por territorio."""
-texto_circular = """El gráfico circular muestra las diez ciudades con menor número de muertes registradas durante 2019. Cada sector representa el
+texto_circular = """El gráfico circular muestra las diez ciudades con menor número de muertes registradas en el año seleccionado. Cada sector representa el
  aporte porcentual de cada ciudad al total nacional. Esta visualización permite reconocer los municipios con mejores indicadores de mortalidad, 
  que pueden servir como referencia para el diseño de estrategias de bienestar y prevención."""
 texto_apiladas = """En este gráfico se comparan las muertes de hombres y mujeres en cada departamento. La estructura apilada permite visualizar
@@ -204,10 +541,13 @@ texto_histograma = """histograma agrupa las muertes según los rangos definidos
 lo largo del ciclo de vida. La visualización muestra una clara concentración en los grupos de edad avanzada, coherente con el perfil epidemiológico 
 nacional, aunque también se identifican picos en edades jóvenes asociados a causas externas o violentas."""
 
-texto_tabla = """Esta tabla resume las diez principales causas de muerte en el país durante 2019, mostrando su código,
- el nombre de la causa y el número total de casos. El orden descendente facilita identificar los factores que más contribuyen
-   a la mortalidad general, entre los que suelen destacar enfermedades cardiovasculares, respiratorias y ciertos tipos de cáncer.
-     Este análisis es clave para priorizar políticas de salud pública."""
+texto_municipios = """Mapa de las muertes por municipio. Al acercarse o desplazarse, el mapa carga solo los municipios que quedan a la vista,
+ con el detalle que corresponde al zoom. Los colores usan la misma escala para todo el país y respetan los filtros del tablero."""
+
+texto_tabla = """Esta tabla lista todas las causas de muerte de la CIE-10 a tres caracteres con el número total de casos,
+ ordenadas de mayor a menor. Se puede ordenar por cualquier columna, filtrar escribiendo en la fila bajo los encabezados
+   (por ejemplo, un código o una palabra de la descripción) y, al hacer clic en un código, ver el detalle a cuatro caracteres.
+     Los totales respetan los filtros del tablero. Este análisis es clave para priorizar políticas de salud pública."""
 
 # --- App ---
 app = Dash(__name__)
@@ -220,14 +560,17 @@ app.layout = html.Div(
         "padding": "20px"
     },
     children=[
-        html.H1("Análisis de Mortalidad en Colombia - 2019",
+        html.H1(f"Análisis de Mortalidad en Colombia - {PERIODO}",
                 style={"textAlign": "center", "color": "#0d47a1", "marginTop": "20px"}),
         html.Hr(),
+        filtros,
+        html.Hr(),
 
         # --- Mapa con texto ---
         html.Div([
-            html.Div(dcc.Graph(figure=fig_mapa, style={"height": "70vh"}), 
-                    style={"width": "70%", "display": "inline-block", "padding": "10px"}),
+            html.Div([
+                dcc.Graph(id="grafico-mapa", figure=fig_mapa, style={"height": "70vh"})
+            ], style={"width": "70%", "display": "inline-block", "padding": "10px"}),
             html.Div([
                 html.H3("Descripción del Mapa", style={"color": "#0d47a1"}),
                 html.P(texto_mapa, style={"whiteSpace": "pre-line", "textAlign": "justify", "lineHeight": "1.6"})
@@ -235,10 +578,21 @@ app.layout = html.Div(
         ]),
         html.Hr(),
 
+        # --- Mapa municipal (solo si están los GeoJSON de geo/municipios_<nivel>.geojson) ---
+        *([html.Div([
+            html.Div([
+                dcc.Graph(id="grafico-municipios", figure=fig_municipios, style={"height": "70vh"})
+            ], style={"width": "70%", "display": "inline-block", "padding": "10px"}),
+            html.Div([
+                html.H3("Mapa municipal", style={"color": "#0d47a1"}),
+                html.P(texto_municipios, style={"textAlign": "justify", "lineHeight": "1.6"})
+            ], style={"width": "25%", "display": "inline-block", "verticalAlign": "top", "padding": "20px"})
+        ]), html.Hr()] if municipal is not None else []),
+
         # --- Línea + Barras ---
         html.Div([
             html.Div([
-                dcc.Graph(figure=fig_lineal, style={"height": "70vh"}),
+                dcc.Graph(id="grafico-lineal", figure=fig_lineal, style={"height": "70vh"}),
                 html.Div([
                     html.H4("Explicación Gráfico Lineal", style={"color": "#0d47a1"}),
                     html.P(texto_lineal, style={"textAlign": "justify"})
@@ -246,7 +600,7 @@ app.layout = html.Div(
             ], style={"width": "48%", "display": "inline-block", "padding": "10px"}),
             
             html.Div([
-                dcc.Graph(figure=fig_barras, style={"height": "70vh"}),
+                dcc.Graph(id="grafico-barras", figure=fig_barras, style={"height": "70vh"}),
                 html.Div([
                     html.H4("Explicación Gráfico de Barras", style={"color": "#0d47a1"}),
                     html.P(texto_barras, style={"textAlign": "justify"})
@@ -255,10 +609,17 @@ app.layout = html.Div(
         ]),
         html.Hr(),
 
+        # --- Ranking por causa ---
+        html.Div([
+            html.H3("Ranking de municipios por causa de muerte", style={"color": "#0d47a1"}),
+            ranking
+        ], style={"padding": "10px"}),
+        html.Hr(),
+
         # --- Circular + Apiladas ---
         html.Div([
             html.Div([
-                dcc.Graph(figure=fig_circular, style={"height": "70vh"}),
+                dcc.Graph(id="grafico-circular", figure=fig_circular, style={"height": "70vh"}),
                 html.Div([
                     html.H4("Explicación Gráfico Circular", style={"color": "#0d47a1"}),
                     html.P(texto_circular, style={"textAlign": "justify"})
@@ -266,7 +627,7 @@ app.layout = html.Div(
             ], style={"width": "48%", "display": "inline-block", "padding": "10px"}),
             
             html.Div([
-                dcc.Graph(figure=fig_apiladas, style={"height": "70vh"}),
+                dcc.Graph(id="grafico-apiladas", figure=fig_apiladas, style={"height": "70vh"}),
                 html.Div([
                     html.H4("Explicación Barras Apiladas", style={"color": "#0d47a1"}),
                     html.P(texto_apiladas, style={"textAlign": "justify"})
@@ -278,7 +639,7 @@ app.layout = html.Div(
         # --- Histograma + Tabla ---
         html.Div([
             html.Div([
-                dcc.Graph(figure=fig_histograma, style={"height": "70vh"}),
+                dcc.Graph(id="grafico-histograma", figure=fig_histograma, style={"height": "70vh"}),
                 html.Div([
                     html.H4("Explicación Histograma", style={"color": "#0d47a1"}),
                     html.P(texto_histograma, style={"textAlign": "justify"})
@@ -288,6 +649,11 @@ app.layout = html.Div(
             html.Div([
                 html.H3("Códigos de mortalidad - Casos registrados",
                         style={"textAlign": "center", "color": "#0d47a1", "marginBottom": "10px"}),
+                html.Div([
+                    html.Span(id="tabla-nivel", children="Códigos a 3 caracteres", style={"marginRight": "10px"}),
+                    html.Button("Volver a 3 caracteres", id="tabla-volver", n_clicks=0),
+                ], style={"textAlign": "center", "marginBottom": "8px"}),
+                dcc.Store(id="tabla-padre", data=None),
                 tabla_dash,
                 html.Div([
                     html.H4("Explicación Tabla", style={"color": "#0d47a1"}),
@@ -307,6 +673,122 @@ app.layout = html.Div(
 )
 
 
+# --- Callbacks ---
+@app.callback(
+    Output("grafico-mapa", "figure"),
+    Output("grafico-lineal", "figure"),
+    Output("grafico-barras", "figure"),
+    Output("grafico-circular", "figure"),
+    Output("grafico-apiladas", "figure"),
+    Output("grafico-histograma", "figure"),
+    Input("filtro-anio", "value"),
+    Input("filtro-departamento", "value"),
+    Input("filtro-sexo", "value"),
+    Input("filtro-mes", "value"),
+    Input("filtro-edad", "value"),
+)
+def actualizar_figuras(anio, departamentos, sexos, meses, edades):
+    seleccion = (clave_filtro(departamentos), clave_filtro(sexos), clave_filtro(meses), clave_filtro(edades))
+    return (figura_mapa_filtrada(anio, *seleccion), *figuras_filtradas(clave_anio(anio), *seleccion))
+
+@app.callback(
+    Output("grafico-ranking", "figure"),
+    Input("ranking-prefijo", "value"),
+    Input("ranking-capitulo", "value"),
+    Input("ranking-k", "value"),
+    Input("ranking-sentido", "value"),
+    Input("filtro-anio", "value"),
+    Input("filtro-departamento", "value"),
+    Input("filtro-sexo", "value"),
+    Input("filtro-mes", "value"),
+    Input("filtro-edad", "value"),
+)
+def actualizar_ranking(prefijo, capitulo, k, sentido, anio, departamentos, sexos, meses, edades):
+    if not hay_filtros:
+        return no_update
+    prefijo = (prefijo or "").strip().upper() or None
+    return figura_ranking_filtrada(prefijo, capitulo, int(k or 5), sentido != "menores",
+                                   clave_filtro(departamentos), clave_filtro(sexos),
+                                   clave_filtro(meses), clave_filtro(edades), clave_anio(anio))
+
+@app.callback(
+    Output("tabla-padre", "data"),
+    Output("tabla-causas", "page_current"),
+    Output("tabla-causas", "active_cell"),
+    Output("tabla-nivel", "children"),
+    Input("tabla-causas", "active_cell"),
+    Input("tabla-volver", "n_clicks"),
+    State("tabla-padre", "data"),
+)
+def bajar_nivel_tabla(celda, _clics, padre):
+    """Un clic en un código de 3 caracteres muestra sus hijos de 4; el botón vuelve."""
+    if ctx.triggered_id == "tabla-volver":
+        return None, 0, None, "Códigos a 3 caracteres"
+    if padre is None and celda and celda.get("column_id") == "codigo" and tabla.tiene_hijos(celda.get("row_id")):
+        codigo = celda["row_id"]
+        return codigo, 0, None, f"Detalle de {codigo} a 4 caracteres"
+    return no_update, no_update, no_update, no_update
+
+@app.callback(
+    Output("tabla-causas", "data"),
+    Output("tabla-causas", "page_count"),
+    Input("tabla-causas", "page_current"),
+    Input("tabla-causas", "page_size"),
+    Input("tabla-causas", "sort_by"),
+    Input("tabla-causas", "filter_query"),
+    Input("tabla-padre", "data"),
+    Input("filtro-anio", "value"),
+    Input("filtro-departamento", "value"),
+    Input("filtro-sexo", "value"),
+    Input("filtro-mes", "value"),
+    Input("filtro-edad", "value"),
+)
+def actualizar_tabla(pagina, tamano, orden_por, filtro, padre, anio, departamentos, sexos, meses, edades):
+    totales, ordenes = vista_tabla(clave_filtro(departamentos), clave_filtro(sexos),
+                                   clave_filtro(meses), clave_filtro(edades), clave_anio(anio))
+    return tabla.pagina(totales, ordenes, padre, pagina or 0, tamano or 10, orden_por, filtro)
+
+if municipal is not None:
+    @app.callback(
+        Output("grafico-municipios", "figure"),
+        Input("grafico-municipios", "relayoutData"),
+        Input("filtro-anio", "value"),
+        Input("filtro-departamento", "value"),
+        Input("filtro-sexo", "value"),
+        Input("filtro-mes", "value"),
+        Input("filtro-edad", "value"),
+    )
+    def actualizar_municipios(relayout, anio, departamentos, sexos, meses, edades):
+        """Cada vez que el mapa se mueve pide solo los municipios de la nueva vista."""
+        vista = mapa_municipal.vista_relayout(relayout)
+        if vista is None:
+            if ctx.triggered_id == "grafico-municipios":
+                return no_update  # Eventos sin cambio de vista (autosize, clics en la leyenda)
+            vista = (caja_inicial, mapa_municipal.VISTA_INICIAL["zoom"], None)
+        caja, zoom, _ = vista
+        return figura_municipios_vista(mapa_municipal.ampliar(caja), municipal.nivel(zoom),
+                                       clave_filtro(departamentos), clave_filtro(sexos),
+                                       clave_filtro(meses), clave_filtro(edades), clave_anio(anio))
+
+# --- Layout y dependencias serializados una sola vez (LAYOUT_PRECALCULADO=0 lo desactiva) ---
+if os.environ.get("LAYOUT_PRECALCULADO", "1") != "0":
+    respuestas.precalcular_rutas(app)
+
+# --- Métricas (/metrics, METRICAS=0 las desactiva) ---
+metricas.instrumentar_servidor(server)
+metricas.indicador("cache_figuras_aciertos", "Aciertos de la caché LRU de figuras",
+                   lambda: figuras_filtradas.cache_info().hits)
+metricas.indicador("cache_figuras_fallos", "Fallos de la caché LRU de figuras",
+                   lambda: figuras_filtradas.cache_info().misses)
+metricas.indicador("cache_figuras_tamano", "Entradas en la caché LRU de figuras",
+                   lambda: figuras_filtradas.cache_info().currsize)
+metricas.indicador("cache_mapa_aciertos", "Aciertos de la caché LRU del mapa",
+                   lambda: mapa_filtrado.cache_info().hits)
+metricas.indicador("cache_mapa_fallos", "Fallos de la caché LRU del mapa",
+                   lambda: mapa_filtrado.cache_info().misses)
+metricas.indicador("cache_mapa_tamano", "Entradas en la caché LRU del mapa",
+                   lambda: mapa_filtrado.cache_info().currsize)
+metricas.registrar("arranque_app", time.perf_counter() - _inicio_arranque)
 
 #if __name__ == "__main__":
 ##  app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""Base SQLite opcional para consultar más años de registros de los que caben en memoria.
+
+Los registros normalizados de NoFetal (solo las columnas del cubo) y las
+dimensiones DIVIPOLA y CIE-10 se cargan en un archivo SQLite con índices
+que cubren cada consulta del tablero. Cada agregación de process.py tiene
+aquí su versión SQL: la base hace la pasada sobre los registros y pandas
+solo termina el resultado, que tiene pocas filas, con el mismo código que
+usa el cubo en memoria. Así cada agregado devuelve exactamente la misma
+forma que su versión de process.py.
+
+Uso:
+    python base_sqlite.py --destino info/mortalidad.sqlite
+    python base_sqlite.py --destino info/mortalidad.sqlite --multianual
+    BASE_SQLITE=info/mortalidad.sqlite python app.py
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+import metricas
+import process
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_MUERTES = list(process.ESQUEMA_NOFETAL)
+
+# Cada índice cubre las columnas de al menos una consulta, que se responde sin leer la tabla
+INDICES = {
+    'ix_muertes_lugar': ['cod_departamento', 'cod_municipio'],
+    'ix_muertes_causa': ['cod_muerte', 'cod_departamento', 'cod_municipio'],
+    'ix_muertes_mes': ['mes'],
+    'ix_muertes_sexo': ['cod_departamento', 'sexo'],
+    'ix_muertes_ano': ['ano', 'cod_departamento'],
+    'ix_muertes_edad': ['grupo_edad1'],
+}
+
+
+def _columna(nombre):
+    # Los nombres de CodigosDeMuerte llevan guiones: siempre entre comillas
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _filas(df):
+    """Filas de `df` como tuplas de escalares de Python (None en lugar de NA)."""
+    columnas = [df[col].to_numpy(dtype=object, na_value=None) for col in df.columns]
+    return zip(*columnas)
+
+
+def _insertar(conexion, tabla, df):
+    marcadores = ", ".join("?" * len(df.columns))
+    conexion.executemany(f"INSERT INTO {tabla} VALUES ({marcadores})", _filas(df))
+
+
+@metricas.instrumentar()
+def crear_base(destino, directorio="info", tamano_bloque=200_000, multianual=False):
+    """Crea el archivo SQLite `destino` a partir de las bases de `directorio`.
+
+    NoFetal se lee por bloques y cada bloque entra con un solo executemany,
+    todos dentro de una única transacción; los índices se crean al final,
+    que es más rápido que mantenerlos fila a fila. La memoria queda acotada
+    por el tamaño del bloque.
+    """
+    if multianual:
+        rutas = list(process.archivos_nofetal(directorio).values())
+        if not rutas:
+            raise FileNotFoundError(f"No hay archivos NoFetal<año>.csv en {directorio}")
+    else:
+        rutas = [os.path.join(directorio, process.ARCHIVOS['muerte'][0])]
+    cod = process.cargar_archivo('cod', directorio)
+    pola = process.cargar_archivo('pola', directorio)
+    dimensiones = process.construir_dimensiones(cod, pola)
+
+    temporal = destino + ".tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    conexion = sqlite3.connect(temporal, isolation_level=None)
+    try:
+        # Carga masiva: sin diario ni fsync; si algo falla se descarta el archivo temporal
+        conexion.execute("PRAGMA journal_mode = OFF")
+        conexion.execute("PRAGMA synchronous = OFF")
+        conexion.execute("BEGIN")
+        conexion.execute(f"CREATE TABLE muertes ({', '.join(COLUMNAS_MUERTES)})")
+        filas = 0
+        for ruta in rutas:
+            for bloque in process.leer_por_bloques(ruta, tamano_bloque):
+                _insertar(conexion, "muertes", bloque[COLUMNAS_MUERTES])
+                filas += len(bloque)
+        for nombre, dim in dimensiones.items():
+            plana = dim.reset_index()
+            conexion.execute(f"CREATE TABLE {nombre} ({', '.join(map(_columna, plana.columns))}, "
+                             f"PRIMARY KEY ({', '.join(map(_columna, process.CLAVES_DIMENSIONES[nombre]))}))")
+            _insertar(conexion, nombre, plana)
+        for indice, columnas in INDICES.items():
+            conexion.execute(f"CREATE INDEX {indice} ON muertes ({', '.join(columnas)})")
+        conexion.execute("COMMIT")
+        conexion.execute("ANALYZE")
+    finally:
+        conexion.close()
+    os.replace(temporal, destino)
+    logger.info("base %s: %d registros de %d archivos", destino, filas, len(rutas))
+    return destino
+
+
+### Filtros del tablero como cláusula WHERE
+
+def condiciones(departamentos=None, sexos=None, meses=None, edades=None, anios=None):
+    """(cláusula WHERE, parámetros) equivalente a process.filtrar_cubo."""
+    partes, parametros = [], []
+    for columna, valores in [('cod_departamento', departamentos), ('sexo', sexos),
+                             ('mes', meses), ('ano', anios)]:
+        if valores:
+            partes.append(f"{columna} IN ({', '.join('?' * len(valores))})")
+            parametros.extend(int(v) for v in valores)
+    if edades:
+        # Cada categoría se traduce a sus códigos GRUPO_EDAD1; la desconocida incluye nulos e inválidos
+        codigos = [int(c) for c, posicion in enumerate(process._CATEGORIA_POR_CODIGO)
+                   if process.CATEGORIAS_EDAD[posicion] in edades]
+        edad = f"grupo_edad1 IN ({', '.join('?' * len(codigos))})" if codigos else "0"
+        if "Edad desconocida" in edades:
+            edad = (f"({edad} OR grupo_edad1 IS NULL OR grupo_edad1 < 0 "
+                    f"OR grupo_edad1 >= {len(process._CATEGORIA_POR_CODIGO)})")
+        partes.append(edad)
+        parametros.extend(codigos)
+    return (" WHERE " + " AND ".join(partes) if partes else ""), parametros
+
+
+def _y(donde, condicion):
+    return f"{donde} AND {condicion}" if donde else f" WHERE {condicion}"
+
+
+### Agregaciones en SQL, por nombre (las mismas de process.AGREGADOS)
+
+CONSULTAS = {}
+
+
+def consulta(funcion):
+    CONSULTAS[funcion.__name__] = metricas.instrumentar(f"sql_{funcion.__name__}")(funcion)
+    return funcion
+
+
+def _proyeccion(conexion, columnas, donde, parametros):
+    # GROUP BY sobre columnas de un índice: se resuelve recorriendo solo el índice
+    lista = ", ".join(columnas)
+    return pd.read_sql_query(
+        f"SELECT {lista}, COUNT(*) AS total FROM muertes{donde} GROUP BY {lista}", conexion, params=parametros)
+
+
+@consulta
+def data_mapa(conexion, dimensiones, donde, parametros):
+    return process.AGREGADOS['data_mapa'](
+        _proyeccion(conexion, ['ano', 'cod_departamento'], donde, parametros), dimensiones)
+
+
+def _ranking_municipios(conexion, donde, parametros, k, mayores, columna_total):
+    # Empates por nombre, como el sort estable sobre el groupby ordenado de process
+    sentido = "DESC" if mayores else "ASC"
+    return pd.read_sql_query(
+        f"SELECT u.municipio, SUM(m.total) AS {columna_total} "
+        f"FROM (SELECT cod_departamento, cod_municipio, COUNT(*) AS total FROM muertes{donde} "
+        f"      GROUP BY cod_departamento, cod_municipio) AS m "
+        f"JOIN municipios AS u USING (cod_departamento, cod_municipio) "
+        f"GROUP BY u.municipio ORDER BY {columna_total} {sentido}, u.municipio LIMIT ?",
+        conexion, params=[*parametros, int(k)])
+
+
+def rango_causas(prefijo=None, capitulo=None):
+    """Condición y parámetros de un prefijo CIE-10 o un capítulo (usa el índice por cod_muerte)."""
+    if capitulo:
+        desde, hasta, _ = process.CAPITULOS_CIE10[capitulo]
+    else:
+        desde = hasta = prefijo
+    return "cod_muerte >= ? AND cod_muerte < ?", [desde, hasta + "\uffff"]
+
+
+@consulta
+def grafico_barras(conexion, dimensiones, donde, parametros):
+    condicion, rango = rango_causas('X95')
+    return _ranking_municipios(conexion, _y(donde, condicion), [*parametros, *rango], 5, True, 'total_homicidios')
+
+
+@consulta
+def grafico_circular(conexion, dimensiones, donde, parametros):
+    return _ranking_municipios(conexion, donde, parametros, 10, False, 'total_muertes')
+
+
+@consulta
+def tabla(conexion, dimensiones, donde, parametros):
+    codigo = _columna('codigo_de_la_cie-10_tres_caracteres')
+    descripcion = 'descripcion__de_codigos_mortalidad_a_tres_caracteres'
+    # Igual que process.tabla: cada código de 4 caracteres suma en su categoría de 3
+    return pd.read_sql_query(
+        f"SELECT m.cod_muerte, c.{_columna(descripcion)} AS {_columna(descripcion)}, SUM(m.total) AS total_casos "
+        f"FROM (SELECT substr(cod_muerte, 1, 3) AS cod_muerte, COUNT(*) AS total FROM muertes{donde} "
+        f"GROUP BY substr(cod_muerte, 1, 3)) AS m "
+        f"JOIN causas AS c ON c.{codigo} = m.cod_muerte "
+        f"GROUP BY m.cod_muerte, c.{_columna(descripcion)} "
+        f"ORDER BY total_casos DESC, m.cod_muerte, c.{_columna(descripcion)} LIMIT 10",
+        conexion, params=parametros)
+
+
+@consulta
+def grafico_apiladas(conexion, dimensiones, donde, parametros):
+    return process.AGREGADOS['grafico_apiladas'](
+        _proyeccion(conexion, ['cod_departamento', 'sexo'], donde, parametros), dimensiones)
+
+
+@consulta
+def histograma(conexion, dimensiones, donde, parametros):
+    return process.AGREGADOS['histograma'](
+        _proyeccion(conexion, ['grupo_edad1'], donde, parametros), dimensiones)
+
+
+@consulta
+def grafico_lineal(conexion, dimensiones, donde, parametros):
+    return process.AGREGADOS['grafico_lineal'](
+        _proyeccion(conexion, ['mes'], _y(donde, "mes IS NOT NULL"), parametros), dimensiones)
+
+
+class BaseSQLite:
+    """Consultas de solo lectura sobre una base creada con crear_base.
+
+    Cada hilo del servidor usa su propia conexión; las dimensiones (pocas
+    filas) se leen una sola vez a pandas.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._dimensiones = None
+
+    def conexion(self):
+        if getattr(self._local, "conexion", None) is None:
+            self._local.conexion = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True,
+                                                   check_same_thread=False)
+        return self._local.conexion
+
+    def dimensiones(self):
+        if self._dimensiones is None:
+            tablas = {fila[0] for fila in self.conexion().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self._dimensiones = {
+                nombre: pd.read_sql_query(f"SELECT * FROM {nombre}", self.conexion()).set_index(claves)
+                for nombre, claves in process.CLAVES_DIMENSIONES.items() if nombre in tablas}
+        return self._dimensiones
+
+    def agregado(self, nombre, departamentos=None, sexos=None, meses=None, edades=None, anios=None):
+        """Misma salida que process.AGREGADOS[nombre] sobre el cubo filtrado igual."""
+        donde, parametros = condiciones(departamentos, sexos, meses, edades, anios)
+        return CONSULTAS[nombre](self.conexion(), self.dimensiones(), donde, parametros)
+
+    def totales_por_causa(self, departamentos=None, sexos=None, meses=None, edades=None, anios=None):
+        """Serie de muertes por cod_muerte, para la tabla de causas."""
+        donde, parametros = condiciones(departamentos, sexos, meses, edades, anios)
+        totales = pd.read_sql_query(
+            f"SELECT cod_muerte, COUNT(*) AS total FROM muertes{_y(donde, 'cod_muerte IS NOT NULL')} "
+            f"GROUP BY cod_muerte", self.conexion(), params=parametros)
+        return totales.set_index("cod_muerte")["total"]
+
+    def totales_por_municipio(self, departamentos=None, sexos=None, meses=None, edades=None, anios=None):
+        """Muertes por (cod_departamento, cod_municipio), para el mapa municipal."""
+        donde, parametros = condiciones(departamentos, sexos, meses, edades, anios)
+        return pd.read_sql_query(
+            f"SELECT cod_departamento, cod_municipio, COUNT(*) AS total FROM muertes"
+            f"{_y(donde, 'cod_departamento IS NOT NULL AND cod_municipio IS NOT NULL')} "
+            f"GROUP BY cod_departamento, cod_municipio", self.conexion(), params=parametros)
+
+    def ranking_municipios(self, prefijo=None, capitulo=None, k=5, mayores=True, departamentos=None,
+                           sexos=None, meses=None, edades=None, anios=None):
+        """Como process.ranking_municipios: columnas municipio y total."""
+        donde, parametros = condiciones(departamentos, sexos, meses, edades, anios)
+        if prefijo or capitulo:
+            condicion, rango = rango_causas(prefijo, capitulo)
+            donde, parametros = _y(donde, condicion), [*parametros, *rango]
+        return _ranking_municipios(self.conexion(), donde, parametros, k, mayores, 'total')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--destino", default=os.path.join("info", "mortalidad.sqlite"))
+    parser.add_argument("--directorio", default="info")
+    parser.add_argument("--tamano-bloque", type=int, default=200_000)
+    parser.add_argument("--multianual", action="store_true", help="Cargar todos los NoFetal<año>.csv")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    crear_base(args.destino, args.directorio, args.tamano_bloque, args.multianual)
+
+
+if __name__ == "__main__":
+    main()
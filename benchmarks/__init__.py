@@ -0,0 +1,6 @@
+"""Benchmarks del procesamiento y del tablero.
+
+- sintetico: genera bases con el esquema del DANE a cualquier escala.
+- ejecutar: mide cada etapa a 1x/10x/100x y compara contra corridas anteriores.
+- bench_normalizacion: compara la normalización de tildes anterior y la vectorizada.
+"""
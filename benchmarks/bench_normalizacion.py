@@ -0,0 +1,79 @@
+"""Compara la normalización de tildes celda a celda contra la vectorizada.
+
+Uso: python benchmarks/bench_normalizacion.py --filas 2000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def quitar_tildes_celda(texto):
+    """Implementación anterior: 12 str.replace por celda."""
+    reemplazos = {
+        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+        'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
+        'ñ': 'n', 'Ñ': 'N'}
+    if isinstance(texto, str):
+        for acento, sin_acento in reemplazos.items():
+            texto = texto.replace(acento, sin_acento)
+    return texto
+
+
+def importar_process():
+    sys.path.insert(0, RAIZ)
+    import process
+    return process
+
+
+def marco_sintetico(filas, semilla=0):
+    """Marco con la forma de NoFetal: códigos numéricos y textos con tildes."""
+    rng = np.random.default_rng(semilla)
+    municipios = np.array([f"MUNICIPIO {i} ÁÉÍÓÚÑ" for i in range(1100)], dtype=object)
+    areas = np.array(["Cabecera municipal", "Centro poblado (Inspección, corregimiento)",
+                      "Rural disperso", "Sin información"], dtype=object)
+    causas = np.array([f"{letra}{n:02d}" for letra in "ACIJKRVX" for n in range(100)], dtype=object)
+    return pd.DataFrame({
+        "cod_departamento": rng.integers(5, 100, filas),
+        "cod_municipio": rng.integers(1, 900, filas),
+        "ano": np.full(filas, 2019),
+        "mes": rng.integers(1, 13, filas),
+        "sexo": rng.integers(1, 4, filas),
+        "grupo_edad1": rng.integers(0, 30, filas),
+        "area_defuncion": areas[rng.integers(0, len(areas), filas)],
+        "municipio": municipios[rng.integers(0, len(municipios), filas)],
+        "cod_muerte": causas[rng.integers(0, len(causas), filas)],
+    })
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    process = importar_process()
+    df = marco_sintetico(args.filas)
+
+    t_anterior, anterior = cronometrar(df.map, quitar_tildes_celda)
+    t_nuevo, nuevo = cronometrar(process.normalizar_texto, df)
+    pd.testing.assert_frame_equal(anterior, nuevo, check_dtype=False)
+
+    print(f"filas: {args.filas:,}")
+    print(f"celda a celda (DataFrame.map): {t_anterior:8.2f} s")
+    print(f"vectorizada (normalizar_texto): {t_nuevo:8.2f} s")
+    print(f"aceleración: {t_anterior / t_nuevo:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Mide cada etapa de process.py y app.py sobre bases sintéticas a varias escalas.
+
+Cada escala corre en un proceso aparte (el pico de RSS es por proceso) sobre
+un directorio temporal con bases generadas por benchmarks.sintetico. Los
+resultados se escriben en JSON y pueden compararse con una corrida anterior
+para detectar regresiones.
+
+Uso:
+    python -m benchmarks.ejecutar --escalas 1,10,100 --salida resultados.json
+    python -m benchmarks.ejecutar --escalas 1 --comparar resultados.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Filas de la escala 1x: del orden de las defunciones no fetales de un año
+FILAS_BASE = 250_000
+
+
+def rss_pico_mb():
+    # En Linux ru_maxrss viene en KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_actual_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+class Cronometro:
+    """Registra tiempo y memoria de cada etapa medida."""
+
+    def __init__(self):
+        self.etapas = {}
+
+    def medir(self, nombre, funcion, *args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        actual = rss_actual_mb()
+        self.etapas[nombre] = {
+            "segundos": round(segundos, 6),
+            "rss_pico_mb": round(rss_pico_mb(), 1),
+            "rss_actual_mb": None if actual is None else round(actual, 1),
+        }
+        return resultado
+
+
+def medir_escala(filas, directorio):
+    """Corre todas las etapas en `directorio` (se llama dentro del subproceso)."""
+    from benchmarks import sintetico
+
+    crono = Cronometro()
+    info = os.path.join(directorio, "info")
+    crono.medir("generar_sintetico", sintetico.generar, info, filas)
+    os.chdir(directorio)
+    for nombre in ("geo", "departamentos_colombia.geojson"):
+        os.symlink(os.path.join(RAIZ, nombre), os.path.join(directorio, nombre))
+
+    import process
+    muerte, cod, pola = crono.medir("cargar_archivos", process.cargar_archivos, usar_cache=False)
+    crono.medir("cargar_archivos_cache_fria", process.cargar_archivos)
+    crono.medir("cargar_archivos_cache_caliente", process.cargar_archivos)
+    dimensiones = crono.medir("construir_dimensiones", process.construir_dimensiones, cod, pola)
+    muerte_proc = crono.medir("preparar_datos", process.preparar_datos, muerte, cod, pola, dimensiones)
+    compacto = crono.medir("preparar_datos_compacto", process.preparar_datos, muerte, cod, pola,
+                           dimensiones, compacto=True)
+    memoria = process.reporte_memoria(muerte_proc, compacto).loc['total']
+    del muerte_proc, compacto
+    cubo = crono.medir("construir_cubo", process.construir_cubo, muerte)
+    agregados = {
+        nombre: crono.medir(nombre, calcular, cubo, dimensiones)
+        for nombre, calcular in process.AGREGADOS.items()}
+
+    # Salidas como las de construir.py, para que app.py arranque sobre ellas
+    import construir
+    for nombre, archivo in construir.SALIDAS.items():
+        construir.escribir_salida(agregados[nombre], os.path.join(info, f"{archivo}.csv"))
+    crono.medir("guardar_cubo", process.guardar_cubo, "info/cubo", cubo, dimensiones)
+
+    import base_sqlite
+    crono.medir("crear_base_sqlite", base_sqlite.crear_base, os.path.join(info, "mortalidad.sqlite"))
+    base = base_sqlite.BaseSQLite(os.path.join(info, "mortalidad.sqlite"))
+    crono.medir("consultas_sqlite", lambda: [base.agregado(nombre) for nombre in base_sqlite.CONSULTAS])
+
+    sys.argv = sys.argv[:1]
+    app = crono.medir("app_arranque", __import__, "app")
+    anio = app.anios_mapa[-1]
+    crono.medir("figura_mapa", app.figura_mapa, agregados["data_mapa"], anio)
+    crono.medir("figura_lineal", app.figura_lineal, agregados["grafico_lineal"])
+    crono.medir("figura_barras", app.figura_barras, agregados["grafico_barras"])
+    crono.medir("figura_circular", app.figura_circular, agregados["grafico_circular"])
+    crono.medir("figura_apiladas", app.figura_apiladas, agregados["grafico_apiladas"])
+    crono.medir("figura_histograma", app.figura_histograma, agregados["histograma"])
+    crono.medir("figura_mapa_filtrada", app.figura_mapa_filtrada, anio, None, (2,), None, None)
+    crono.medir("figuras_filtradas", app.figuras_filtradas, app.clave_anio(anio), None, (2,), None, None)
+
+    from dash._utils import to_json
+    layout = crono.medir("serializar_layout", to_json, app.app.layout)
+    return {
+        "filas": filas,
+        "etapas": crono.etapas,
+        "rss_pico_mb": round(rss_pico_mb(), 1),
+        "bytes_layout": len(layout),
+        "muerte_proc_mb": float(memoria["mb_antes"]),
+        "muerte_proc_compacto_mb": float(memoria["mb_despues"]),
+    }
+
+
+def correr_escala(escala, filas_base):
+    """Lanza medir_escala en un subproceso y devuelve su resultado."""
+    directorio = tempfile.mkdtemp(prefix=f"bench_{escala}x_")
+    try:
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.ejecutar", "--medir", str(escala * filas_base),
+             "--directorio", directorio],
+            cwd=RAIZ, check=True, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def comparar(actual, anterior, tolerancia, minimo=0.05):
+    """Lista las etapas que empeoraron más que `tolerancia` (fracción) entre dos corridas."""
+    regresiones = []
+    for escala, resultado in actual["escalas"].items():
+        previo = anterior.get("escalas", {}).get(escala)
+        if not previo:
+            continue
+        for etapa, medida in resultado["etapas"].items():
+            antes = previo["etapas"].get(etapa)
+            if not antes or antes["segundos"] < minimo:
+                continue  # Etapas muy cortas: el ruido supera la señal
+            razon = medida["segundos"] / antes["segundos"]
+            if razon > 1 + tolerancia:
+                regresiones.append((escala, etapa, antes["segundos"], medida["segundos"], razon))
+        if resultado["rss_pico_mb"] > previo["rss_pico_mb"] * (1 + tolerancia):
+            regresiones.append((escala, "rss_pico_mb", previo["rss_pico_mb"], resultado["rss_pico_mb"],
+                                resultado["rss_pico_mb"] / previo["rss_pico_mb"]))
+    return regresiones
+
+
+def imprimir(resultados):
+    for escala, resultado in resultados["escalas"].items():
+        print(f"\n== {escala}x ({resultado['filas']:,} filas), RSS pico {resultado['rss_pico_mb']:.0f} MB")
+        if "muerte_proc_mb" in resultado:
+            print(f"  muerte_proc {resultado['muerte_proc_mb']:.1f} MB, "
+                  f"compacto {resultado['muerte_proc_compacto_mb']:.1f} MB")
+        for etapa, medida in resultado["etapas"].items():
+            print(f"  {etapa:32s} {medida['segundos']:10.3f} s {medida['rss_pico_mb']:10.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escalas", default="1,10", help="Multiplicadores de FILAS_BASE, ej. 1,10,100")
+    parser.add_argument("--filas-base", type=int, default=FILAS_BASE)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Resultados JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Empeoramiento permitido antes de marcar regresión (0.2 = 20%%)")
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--directorio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        # Modo interno: una sola escala, resultado en la última línea de stdout
+        print(json.dumps(medir_escala(args.medir, args.directorio)))
+        return
+
+    resultados = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "escalas": {},
+    }
+    for escala in (int(e) for e in args.escalas.split(",")):
+        resultados["escalas"][str(escala)] = correr_escala(escala, args.filas_base)
+    imprimir(resultados)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        for escala, etapa, antes, ahora, razon in regresiones:
+            print(f"REGRESIÓN {escala}x {etapa}: {antes:.3f} -> {ahora:.3f} ({razon:.2f}x)")
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
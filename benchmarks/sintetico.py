@@ -0,0 +1,167 @@
+"""Generador sembrado de bases sintéticas con el esquema de NoFetal2019, CodigosDeMuerte y Divipola.
+
+Los archivos se escriben con los mismos encabezados (mayúsculas, tildes,
+separador ';') que los del DANE, así que process los lee sin cambios. Las
+distribuciones imitan las reales: pocos departamentos concentran la mayoría
+de las muertes, los municipios y las causas siguen una ley de potencias, la
+mortalidad crece con la edad, los códigos de municipio se repiten entre
+departamentos y los textos mezclan variantes con y sin tildes.
+
+Uso: python -m benchmarks.sintetico --filas 250000 --destino /tmp/sintetico/info  (--destino es obligatorio)
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# (código, nombre, municipios, peso relativo de las muertes)
+DEPARTAMENTOS = [
+    (5, "ANTIOQUIA", 125, 14.0), (8, "ATLÁNTICO", 23, 6.0), (11, "BOGOTÁ, D.C.", 1, 16.0),
+    (13, "BOLÍVAR", 46, 4.5), (15, "BOYACÁ", 123, 2.8), (17, "CALDAS", 27, 2.4),
+    (18, "CAQUETÁ", 16, 0.8), (19, "CAUCA", 42, 2.6), (20, "CESAR", 25, 2.0),
+    (23, "CÓRDOBA", 30, 3.0), (25, "CUNDINAMARCA", 116, 5.2), (27, "CHOCÓ", 30, 0.6),
+    (41, "HUILA", 37, 2.2), (44, "LA GUAJIRA", 15, 1.3), (47, "MAGDALENA", 30, 2.4),
+    (50, "META", 29, 2.0), (52, "NARIÑO", 64, 2.6), (54, "NORTE DE SANTANDER", 40, 3.2),
+    (63, "QUINDÍO", 12, 1.4), (66, "RISARALDA", 14, 2.1), (68, "SANTANDER", 87, 4.4),
+    (70, "SUCRE", 26, 1.6), (73, "TOLIMA", 47, 3.0), (76, "VALLE DEL CAUCA", 42, 11.5),
+    (81, "ARAUCA", 7, 0.5), (85, "CASANARE", 19, 0.7), (86, "PUTUMAYO", 13, 0.5),
+    (88, "ARCHIPIÉLAGO DE SAN ANDRÉS, PROVIDENCIA Y SANTA CATALINA", 2, 0.1),
+    (91, "AMAZONAS", 11, 0.1), (94, "GUAINÍA", 9, 0.05), (95, "GUAVIARE", 4, 0.15),
+    (97, "VAUPÉS", 6, 0.05), (99, "VICHADA", 4, 0.1),
+]
+
+# Piezas para nombres de municipio; se repiten entre departamentos como en la DIVIPOLA real
+PREFIJOS = ["SAN", "SANTA", "PUERTO", "LA", "EL", "VILLA", "NUEVA", "SAN JOSÉ DE", ""]
+NUCLEOS = ["UNIÓN", "MARÍA", "BOLÍVAR", "JERUSALÉN", "ANDRÉS", "CARMEN", "ESPERANZA", "NARIÑO",
+           "MONTAÑA", "RÍO", "CHINÁCOTA", "SOLEDAD", "GÓMEZ", "CALDAS", "ASÍS", "PEÑOL"]
+
+CAPITULOS = [
+    ("01", "Ciertas enfermedades infecciosas y parasitarias", "AB"),
+    ("02", "Tumores [neoplasias]", "CD"),
+    ("04", "Enfermedades endocrinas, nutricionales y metabólicas", "E"),
+    ("06", "Enfermedades del sistema nervioso", "G"),
+    ("09", "Enfermedades del sistema circulatorio", "I"),
+    ("10", "Enfermedades del sistema respiratorio", "J"),
+    ("11", "Enfermedades del sistema digestivo", "K"),
+    ("14", "Enfermedades del sistema genitourinario", "N"),
+    ("16", "Ciertas afecciones originadas en el período perinatal", "P"),
+    ("18", "Síntomas, signos y hallazgos anormales clínicos y de laboratorio", "R"),
+    ("20", "Causas externas de morbilidad y de mortalidad", "VWXY"),
+]
+
+# Peso de cada código GRUPO_EDAD1 (0..29): más muertes en la vejez y algunas en menores de 1 año
+PESOS_EDAD = np.array([3, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 2, 3, 4, 4, 4, 5, 6, 8, 10,
+                       13, 15, 16, 17, 17, 15, 11, 7, 3, 1], dtype=float)
+
+AREAS = ["Cabecera municipal", "Centro poblado (Inspección, corregimiento o caserío)",
+         "Rural disperso", "Sin información"]
+SITIOS = ["Hospital/clínica", "Casa/domicilio", "Vía pública", "Lugar de trabajo", "Otro"]
+
+
+def _zipf(rng, n, exponente=1.1):
+    pesos = 1.0 / np.arange(1, n + 1) ** exponente
+    return rng.permutation(pesos / pesos.sum())
+
+
+def _con_o_sin_tildes(rng, texto, proporcion=0.2):
+    # Algunas fuentes llegan sin tildes: ambas variantes deben normalizarse igual
+    if rng.random() < proporcion:
+        return texto.translate(str.maketrans("ÁÉÍÓÚÑáéíóúñ", "AEIOUNaeioun"))
+    return texto
+
+
+def generar_divipola(rng):
+    filas = []
+    for cod_dep, departamento, municipios, _ in DEPARTAMENTOS:
+        # Los códigos de municipio (001, 004, ...) se repiten en todos los departamentos
+        codigos = np.sort(rng.choice(np.arange(1, 900), size=municipios, replace=False))
+        codigos[0] = 1
+        for cod_mun in codigos:
+            nombre = f"{rng.choice(PREFIJOS)} {rng.choice(NUCLEOS)}".strip()
+            if cod_mun == 1:
+                nombre = departamento.split(",")[0] if municipios == 1 else f"CAPITAL {departamento}"
+            filas.append((cod_dep, departamento, int(cod_mun), _con_o_sin_tildes(rng, nombre), "1/1/1900"))
+    return pd.DataFrame(filas, columns=["COD_DEPARTAMENTO", "DEPARTAMENTO", "COD_MUNICIPIO",
+                                        "MUNICIPIO", "FECHA1erFIS"])
+
+
+def generar_codigos(rng):
+    filas = []
+    for capitulo, nombre_capitulo, letras in CAPITULOS:
+        for letra in letras:
+            for numero in sorted(rng.choice(100, size=40, replace=False)):
+                tres = f"{letra}{numero:02d}"
+                descripcion = _con_o_sin_tildes(rng, f"Descripción de la afección {tres} (categoría)")
+                # Las categorías sin subdivisiones (como C61 o I10) solo tienen el código <tres>X
+                hijos = [f"{tres}{d}" for d in range(rng.integers(0, 10))] or [f"{tres}X"]
+                for cuatro in hijos:
+                    filas.append((capitulo, nombre_capitulo, tres, descripcion, cuatro,
+                                  f"Descripción específica {cuatro} según región anatómica"))
+    if not any(f[2] == "X95" for f in filas):
+        filas.append(("20", CAPITULOS[-1][1], "X95", "Agresión con disparo de otras armas de fuego",
+                      "X950", "Agresión con disparo en vivienda"))
+    return pd.DataFrame(filas, columns=[
+        "Capítulo", "Nombre capítulo", "Código de la CIE-10 tres caracteres",
+        "Descripción  de códigos mortalidad a tres caracteres",
+        "Código de la CIE-10 cuatro caracteres",
+        "Descripcion  de códigos mortalidad a cuatro caracteres"])
+
+
+def generar_nofetal(rng, filas, pola, cod, ano=2019):
+    pesos_dep = np.array([d[3] for d in DEPARTAMENTOS])
+    departamentos = np.array([d[0] for d in DEPARTAMENTOS])
+    dep = rng.choice(departamentos, size=filas, p=pesos_dep / pesos_dep.sum())
+    municipio = np.empty(filas, dtype=np.int64)
+    for cod_dep in departamentos:
+        filas_dep = np.flatnonzero(dep == cod_dep)
+        codigos = pola.loc[pola["COD_DEPARTAMENTO"] == cod_dep, "COD_MUNICIPIO"].to_numpy()
+        municipio[filas_dep] = rng.choice(codigos, size=len(filas_dep), p=_zipf(rng, len(codigos)))
+    # Como en los registros del DANE, la causa es el código de 4 caracteres (o el de 3 si la
+    # categoría no se subdivide): se elige la categoría con una ley de potencias y, dentro
+    # de ella, uno de sus códigos
+    orden = np.argsort(cod["Código de la CIE-10 tres caracteres"].to_numpy(), kind="stable")
+    tres = cod["Código de la CIE-10 tres caracteres"].to_numpy()[orden]
+    cuatro = cod["Código de la CIE-10 cuatro caracteres"].to_numpy()[orden]
+    causas, inicios, hijos = np.unique(tres, return_index=True, return_counts=True)
+    causa = rng.choice(len(causas), size=filas, p=_zipf(rng, len(causas), 0.9))
+    posicion = inicios[causa] + (rng.random(filas) * hijos[causa]).astype(np.int64)
+    return pd.DataFrame({
+        "COD_DEPARTAMENTO": dep,
+        "COD_MUNICIPIO": municipio,
+        "AREA_DEFUNCION": rng.choice(AREAS, size=filas, p=[0.78, 0.08, 0.12, 0.02]),
+        "SITIO_DEFUNCION": rng.choice(SITIOS, size=filas),
+        "AÑO": ano,
+        "MES": rng.integers(1, 13, size=filas),
+        "SEXO": rng.choice([1, 2, 3], size=filas, p=[0.55, 0.449, 0.001]),
+        "GRUPO_EDAD1": rng.choice(30, size=filas, p=PESOS_EDAD / PESOS_EDAD.sum()),
+        "COD_MUERTE": np.where(pd.Series(cuatro).str.endswith("X"), tres, cuatro)[posicion],
+    })
+
+
+def generar(destino, filas, semilla=2019, ano=2019):
+    """Escribe NoFetal<año>.csv, CodigosDeMuerte.csv y Divipola.csv en `destino`."""
+    rng = np.random.default_rng(semilla)
+    os.makedirs(destino, exist_ok=True)
+    pola = generar_divipola(rng)
+    cod = generar_codigos(rng)
+    muerte = generar_nofetal(rng, filas, pola, cod, ano)
+    pola.to_csv(os.path.join(destino, "Divipola.csv"), sep=";", index=False)
+    cod.to_csv(os.path.join(destino, "CodigosDeMuerte.csv"), sep=";", index=False)
+    muerte.to_csv(os.path.join(destino, f"NoFetal{ano}.csv"), sep=";", index=False)
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=250_000)
+    # Sin valor por defecto: escribir en info/ reemplazaría las bases reales
+    parser.add_argument("--destino", required=True)
+    parser.add_argument("--semilla", type=int, default=2019)
+    parser.add_argument("--ano", type=int, default=2019)
+    args = parser.parse_args()
+    generar(args.destino, args.filas, args.semilla, args.ano)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Caché columnar en disco para los marcos normalizados de info/*.csv.
+
+Cada archivo fuente se guarda en .cache/<nombre>/, junto al archivo (para
+info/NoFetal2019.csv, info/.cache/NoFetal2019.csv/), como un .npy por
+columna (las columnas de texto como códigos enteros más su lista de
+valores) y un meta.json con la huella del archivo fuente. Si la huella no
+cambia, el marco se reconstruye sin volver a leer ni normalizar el CSV.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_CACHE = ".cache"
+# Subir este número cuando cambie la forma de normalizar los archivos
+VERSION_CACHE = 1
+
+
+def hash_archivo(ruta, bloque=1 << 20):
+    h = hashlib.sha1()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def huella_archivo(ruta, anterior=None):
+    """Tamaño, fecha de modificación y hash del archivo.
+
+    Si tamaño y fecha coinciden con la huella anterior se reutiliza su hash
+    para no releer el archivo completo en cada arranque.
+    """
+    estado = os.stat(ruta)
+    huella = {"tamano": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+    if anterior and all(anterior.get(k) == v for k, v in huella.items()):
+        huella["sha1"] = anterior["sha1"]
+    else:
+        huella["sha1"] = hash_archivo(ruta)
+    return huella
+
+
+def guardar_marco(df, directorio, extra=None):
+    """Guarda el DataFrame columna a columna en `directorio` (escritura atómica)."""
+    padre = os.path.dirname(os.path.abspath(directorio))
+    os.makedirs(padre, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=padre)
+    columnas = []
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        if serie.dtype == object or isinstance(serie.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+            codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+            np.save(os.path.join(tmp, f"{i}.npy"), codigos.astype(np.int32))
+            columnas.append({"nombre": col, "tipo": "texto", "valores": list(np.asarray(valores, dtype=object).tolist())})
+        elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+            # Enteros con nulos (Int8, Int16...): valores y máscara por separado
+            np.save(os.path.join(tmp, f"{i}.npy"), serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0))
+            np.save(os.path.join(tmp, f"{i}.nulos.npy"), serie.isna().to_numpy())
+            columnas.append({"nombre": col, "tipo": "nulable", "dtype": str(serie.dtype)})
+        else:
+            np.save(os.path.join(tmp, f"{i}.npy"), serie.to_numpy())
+            columnas.append({"nombre": col, "tipo": "numerico"})
+    meta = {"version": VERSION_CACHE, "filas": len(df), "columnas": columnas}
+    meta.update(extra or {})
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    if os.path.isdir(directorio):
+        shutil.rmtree(directorio)
+    os.replace(tmp, directorio)
+
+
+def escribir_meta(directorio, meta):
+    """Reescribe meta.json por un temporal, para no dejarlo a medias si se interrumpe."""
+    tmp = os.path.join(directorio, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(directorio, "meta.json"))
+
+
+def leer_meta(directorio):
+    try:
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cargar_marco(directorio, meta=None, mmap=True):
+    """Reconstruye el DataFrame guardado con guardar_marco."""
+    meta = meta or leer_meta(directorio)
+    datos = {}
+    for i, col in enumerate(meta["columnas"]):
+        arreglo = np.load(os.path.join(directorio, f"{i}.npy"), mmap_mode="r" if mmap else None)
+        if col["tipo"] == "texto":
+            # El código -1 (valores nulos) toma el último elemento, que es NaN
+            valores = np.array(col["valores"] + [np.nan], dtype=object)
+            datos[col["nombre"]] = valores.take(arreglo)
+        elif col["tipo"] == "nulable":
+            nulos = np.load(os.path.join(directorio, f"{i}.nulos.npy"))
+            datos[col["nombre"]] = pd.array(np.asarray(arreglo), dtype=col["dtype"])
+            datos[col["nombre"]][nulos] = pd.NA
+        else:
+            datos[col["nombre"]] = arreglo
+    return pd.DataFrame(datos)
+
+
+def ruta_binaria(ruta):
+    """Artefacto columnar que acompaña a un CSV generado: info/mapa.csv -> info/mapa.marco/."""
+    return os.path.splitext(ruta)[0] + ".marco"
+
+
+def guardar_binario(df, ruta):
+    """Guarda `df` junto al CSV `ruta` ya escrito, con la huella de ese CSV."""
+    guardar_marco(df, ruta_binaria(ruta), {"huella": huella_archivo(ruta)})
+
+
+def leer_salida(ruta, leer):
+    """Lee un CSV generado desde su artefacto binario si corresponde al CSV actual.
+
+    Si el CSV se editó a mano (su hash ya no coincide) o no hay artefacto,
+    se devuelve leer(ruta).
+    """
+    binario = ruta_binaria(ruta)
+    meta = leer_meta(binario)
+    if meta and meta.get("version") == VERSION_CACHE and "huella" in meta:
+        if not os.path.exists(ruta):
+            return cargar_marco(binario, meta, mmap=False)
+        if huella_archivo(ruta, meta["huella"])["sha1"] == meta["huella"]["sha1"]:
+            return cargar_marco(binario, meta, mmap=False)
+    return leer(ruta)
+
+
+def directorio_cache(ruta):
+    """Caché de un archivo fuente, en el directorio .cache que está junto a él.
+
+    Así dos directorios de datos con archivos del mismo nombre (benchmarks,
+    ProcesoMortalidad(directorio=...)) no comparten ni pisan sus entradas.
+    """
+    ruta = os.path.abspath(ruta)
+    return os.path.join(os.path.dirname(ruta), DIRECTORIO_CACHE, os.path.basename(ruta))
+
+
+def leer_con_cache(ruta, leer, usar_cache=True):
+    """Devuelve leer(ruta), reutilizando la caché si el archivo no cambió."""
+    if not usar_cache:
+        return leer(ruta)
+    directorio = directorio_cache(ruta)
+    meta = leer_meta(directorio)
+    anterior = meta.get("huella") if meta and meta.get("version") == VERSION_CACHE else None
+    huella = huella_archivo(ruta, anterior)
+    if anterior and huella["sha1"] == anterior["sha1"]:
+        if huella != anterior:
+            # Solo cambió la fecha: se actualiza la huella y se conserva la caché
+            meta["huella"] = huella
+            escribir_meta(directorio, meta)
+        return cargar_marco(directorio, meta)
+    df = leer(ruta)
+    guardar_marco(df, directorio, {"huella": huella})
+    return df
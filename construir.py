@@ -0,0 +1,507 @@
+"""Construcción incremental de info/*.csv y del cubo de info/cubo (reemplaza extraer.ipynb).
+
+Las etapas forman un grafo pequeño:
+
+    fuentes (CSV del DANE) -> dimensiones, cubo -> cada agregado -> cada salida
+
+Cada nodo guarda en info/.construccion.json la huella de sus entradas (los
+hashes de contenido de los nodos de los que depende y el código que lo
+calcula) y el hash de su propio contenido. Un nodo solo se reconstruye si
+cambió su huella de entradas; si al reconstruirlo el contenido resulta
+igual, los nodos siguientes siguen vigentes. El código de un nodo incluye
+las funciones y constantes del proyecto que usa (hash_codigo). Los
+agregados pendientes se calculan sobre el cubo en este proceso y cada
+salida se escribe como CSV y como artefacto columnar (<archivo>.marco/)
+que app.py carga sin parsear el CSV. Al final,
+las salidas, el cubo, las dimensiones y la geometría de geo/ se juntan en
+info/almacen.bin, que los workers de gunicorn abren con mmap (almacen.py).
+
+Con --ingerir se agrega una entrega parcial del DANE (ver ingesta.py): el
+delta se valida, se suma al cubo guardado y solo se recalculan los
+agregados cuya proyección cambió. El archivo queda en info/deltas/, que
+también es una fuente del cubo, así que una reconstrucción completa
+vuelve a aplicar los deltas en orden (y al retirar los de un año cuando
+llega su archivo consolidado el cubo se rehace sin ellos).
+
+Uso:
+    python construir.py
+    python construir.py --simular
+    python construir.py --multianual --trabajadores 4
+    python construir.py --ingerir entrega_2020_03.csv
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import cache
+import geometria
+import ingesta
+import process
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+
+# Subir este número cuando cambie algo que los hashes de código no ven
+VERSION_CONSTRUCCION = 1
+ARCHIVO_ESTADO = ".construccion.json"
+ARCHIVO_ALMACEN = "almacen.bin"
+# Deltas ya ingeridos, en el orden en que se aplicaron (0001_<archivo>.csv, ...)
+DIRECTORIO_DELTAS = "deltas"
+
+# Archivo de info/ en el que se escribe cada agregado
+SALIDAS = {
+    'data_mapa': 'mapa',
+    'grafico_lineal': 'lineal',
+    'grafico_barras': 'df_ciudades',
+    'grafico_circular': 'circular',
+    'grafico_apiladas': 'apiladas',
+    'histograma': 'histogra',
+    'tabla': 'tablita',
+}
+
+
+def hash_texto(*partes):
+    h = hashlib.sha1()
+    for parte in partes:
+        h.update(str(parte).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def hash_marco(df):
+    """Hash del contenido del DataFrame: columnas, tipos y valores."""
+    filas = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hash_texto(list(df.columns), [str(t) for t in df.dtypes],
+                      hashlib.sha1(filas.tobytes()).hexdigest())
+
+
+def _nombres(codigo):
+    """Nombres que usa el código, incluidos los de sus funciones internas y lambdas."""
+    nombres = set(codigo.co_names)
+    for constante in codigo.co_consts:
+        if inspect.iscode(constante):
+            nombres |= _nombres(constante)
+    return nombres
+
+
+def _es_del_proyecto(objeto):
+    modulo = inspect.getmodule(objeto)
+    archivo = getattr(modulo, "__file__", None)
+    return archivo is not None and os.path.dirname(os.path.abspath(archivo)) == DIRECTORIO_PROYECTO
+
+
+def _huella_constante(valor):
+    """Texto estable de una constante de módulo; None si no es un dato simple."""
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return repr(valor)
+    if isinstance(valor, np.ndarray):
+        return None if valor.dtype == object else hashlib.sha1(np.ascontiguousarray(valor).tobytes()).hexdigest()
+    if isinstance(valor, dict):
+        elementos = [_huella_constante(v) for par in valor.items() for v in par]
+    elif isinstance(valor, (tuple, list, set, frozenset)):
+        elementos = [_huella_constante(v) for v in valor]
+    else:
+        return None
+    if any(e is None for e in elementos):
+        return None
+    return f"{type(valor).__name__}({', '.join(sorted(elementos) if isinstance(valor, (set, frozenset)) else elementos)})"
+
+
+def _contenidos(valor):
+    if isinstance(valor, dict):
+        valor = [v for par in valor.items() for v in par]
+    if isinstance(valor, (tuple, list, set, frozenset)):
+        for elemento in valor:
+            yield elemento
+            yield from _contenidos(elemento)
+
+
+def _funciones(objeto):
+    """La función, o las funciones de la clase (métodos y propiedades)."""
+    if inspect.isfunction(objeto):
+        return [objeto]
+    funciones = []
+    for miembro in vars(objeto).values():
+        miembro = getattr(miembro, "fget", None) or getattr(miembro, "__func__", miembro)
+        if inspect.isfunction(inspect.unwrap(miembro)):
+            funciones.append(inspect.unwrap(miembro))
+    return funciones
+
+
+def hash_codigo(*funciones):
+    """Hash del código de `funciones` y de todo lo que usan del proyecto, transitivamente.
+
+    Se recorren las funciones y clases de los módulos del proyecto a las que
+    se refiere por nombre (también como modulo.nombre) y las constantes de
+    módulo que lee, así que cambiar un auxiliar como normalizar_texto o
+    combinar_cubos vence los nodos que dependen de él.
+    """
+    partes, vistos, pendientes = {}, set(), list(funciones)
+    while pendientes:
+        objeto = inspect.unwrap(pendientes.pop())
+        if id(objeto) in vistos:
+            continue
+        vistos.add(id(objeto))
+        partes[f"{objeto.__module__}.{objeto.__qualname__}"] = inspect.getsource(objeto)
+        for funcion_usada in _funciones(objeto):
+            globales = funcion_usada.__globals__
+            nombres = _nombres(funcion_usada.__code__)
+            espacios = [globales] + [vars(modulo) for modulo in (globales.get(n) for n in nombres)
+                                     if inspect.ismodule(modulo) and _es_del_proyecto(modulo)]
+            for espacio in espacios:
+                for nombre in nombres & set(espacio):
+                    valor = espacio[nombre]
+                    if inspect.isfunction(valor) or inspect.isclass(valor):
+                        if _es_del_proyecto(valor):
+                            pendientes.append(valor)
+                    elif not inspect.ismodule(valor) and _huella_constante(valor) is not None:
+                        partes[f"{espacio.get('__name__')}.{nombre}"] = _huella_constante(valor)
+                    else:
+                        # Tablas de funciones como process.ARCHIVOS o process.AGREGADOS
+                        pendientes.extend(f for f in _contenidos(valor)
+                                          if inspect.isfunction(inspect.unwrap(f)) and _es_del_proyecto(f))
+    return hash_texto(*(f"{clave}\n{partes[clave]}" for clave in sorted(partes)))
+
+
+def escribir_salida(df, ruta):
+    """CSV con el formato de siempre ('|', latin1) y su artefacto binario al lado."""
+    df.to_csv(ruta, sep='|', encoding='latin1', index=False)
+    cache.guardar_binario(df, ruta)
+
+
+class Construccion:
+    """Recorre el grafo, reconstruye solo los nodos vencidos y guarda el estado."""
+
+    def __init__(self, directorio="info", trabajadores=None, tamano_bloque=None,
+                 multianual=False, forzar=False, simular=False):
+        self.directorio = directorio
+        self.directorio_cubo = os.path.join(directorio, "cubo")
+        self.directorio_deltas = os.path.join(directorio, DIRECTORIO_DELTAS)
+        self.trabajadores = trabajadores
+        self.simular = simular
+        self.multianual = multianual
+        # El proceso perezoso solo carga las bases que algún nodo vencido necesite
+        self.proceso = process.ProcesoMortalidad(
+            directorio, tamano_bloque=tamano_bloque, multianual=multianual, trabajadores=trabajadores)
+        self.ruta_estado = os.path.join(directorio, ARCHIVO_ESTADO)
+        self.anterior = {} if forzar else self.leer_estado()
+        self.estado = {}
+        self.reconstruidos = []
+
+    def leer_estado(self):
+        try:
+            with open(self.ruta_estado, encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return estado.get("nodos", {}) if estado.get("version") == VERSION_CONSTRUCCION else {}
+
+    def guardar_estado(self):
+        tmp = self.ruta_estado + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION_CONSTRUCCION, "nodos": self.estado}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.ruta_estado)
+
+    def vigente(self, nodo, entradas, existe=True):
+        return existe and self.anterior.get(nodo, {}).get("entradas") == entradas
+
+    def conservar(self, nodo):
+        self.estado[nodo] = self.anterior[nodo]
+        return self.estado[nodo]["contenido"]
+
+    def registrar(self, nodo, entradas, contenido, **extra):
+        self.estado[nodo] = {"entradas": entradas, "contenido": contenido, **extra}
+        self.reconstruidos.append(nodo)
+        return contenido
+
+    def pendiente(self, nodo, entradas):
+        # En simulación no se calcula nada: el contenido nuevo se da por distinto
+        self.reconstruidos.append(nodo)
+        self.estado[nodo] = {"entradas": entradas, "contenido": f"pendiente:{nodo}"}
+        return self.estado[nodo]["contenido"]
+
+    ### Nodos
+
+    def rutas_fuente(self):
+        rutas = {nombre: os.path.join(self.directorio, archivo)
+                 for nombre, (archivo, _) in process.ARCHIVOS.items()}
+        if self.multianual:
+            del rutas['muerte']
+            rutas.update({f"muerte{ano}": ruta for ano, ruta in process.archivos_nofetal(self.directorio).items()})
+        rutas.update({f"delta:{archivo}": os.path.join(self.directorio_deltas, archivo) for archivo in self.deltas()})
+        return rutas
+
+    def deltas(self):
+        if not os.path.isdir(self.directorio_deltas):
+            return []
+        return sorted(archivo for archivo in os.listdir(self.directorio_deltas) if archivo.endswith(".csv"))
+
+    def fuente(self, nombre, ruta):
+        """Hash del archivo crudo; se reutiliza si tamaño y fecha no cambiaron."""
+        nodo = f"fuente:{nombre}"
+        huella = cache.huella_archivo(ruta, self.anterior.get(nodo, {}).get("huella"))
+        if self.vigente(nodo, huella["sha1"]):
+            self.estado[nodo] = dict(self.anterior[nodo], huella=huella)
+            return huella["sha1"]
+        return self.registrar(nodo, huella["sha1"], huella["sha1"], huella=huella)
+
+    def dimensiones(self, fuentes):
+        entradas = hash_texto(VERSION_CONSTRUCCION, hash_codigo(process.ProcesoMortalidad.dimensiones.fget,
+                                                                  process.ProcesoMortalidad.cod.fget),
+                              fuentes['cod'], fuentes['pola'])
+        existe = all(cache.leer_meta(os.path.join(self.directorio_cubo, nombre))
+                     for nombre in process.CLAVES_DIMENSIONES)
+        if self.vigente('dimensiones', entradas, existe):
+            return self.conservar('dimensiones')
+        if self.simular:
+            return self.pendiente('dimensiones', entradas)
+        dimensiones = self.proceso.dimensiones
+        process.guardar_dimensiones(self.directorio_cubo, dimensiones)
+        contenido = hash_texto(*(hash_marco(dimensiones[nombre].reset_index()) for nombre in sorted(dimensiones)))
+        return self.registrar('dimensiones', entradas, contenido)
+
+    def entradas_cubo(self, fuentes):
+        muertes = [fuentes[nombre] for nombre in sorted(fuentes) if nombre.startswith('muerte')]
+        deltas = [fuentes[nombre] for nombre in sorted(fuentes) if nombre.startswith('delta:')]
+        if deltas:
+            deltas.insert(0, hash_codigo(ingesta.leer_delta, ingesta.cubo_delta, ingesta.aplicar_delta))
+        # El cubo sale de ProcesoMortalidad.cubo: por bloques, multianual o de `muerte` completo
+        codigo = hash_codigo(process.ProcesoMortalidad.cubo.fget, process.ProcesoMortalidad.muerte.fget)
+        return hash_texto(VERSION_CONSTRUCCION, codigo, *muertes, *deltas)
+
+    def cubo(self, fuentes):
+        entradas = self.entradas_cubo(fuentes)
+        existe = cache.leer_meta(os.path.join(self.directorio_cubo, 'cubo')) is not None
+        if self.vigente('cubo', entradas, existe):
+            return self.conservar('cubo')
+        if self.simular:
+            return self.pendiente('cubo', entradas)
+        cubo = self.proceso.cubo
+        # Los deltas ingeridos se vuelven a aplicar sobre el cubo de las bases completas
+        for archivo in self.deltas():
+            delta = ingesta.leer_delta(os.path.join(self.directorio_deltas, archivo))
+            cubo = ingesta.aplicar_delta(cubo, ingesta.cubo_delta(delta, cubo))
+        self.proceso.fijar(cubo=cubo)
+        process.guardar_conteos(self.directorio_cubo, cubo)
+        return self.registrar('cubo', entradas, hash_marco(cubo))
+
+    def salida_vigente(self, nodo, entradas, ruta):
+        anterior = self.anterior.get(nodo, {})
+        if anterior.get("entradas") != entradas or not os.path.exists(ruta):
+            return False
+        if cache.leer_meta(cache.ruta_binaria(ruta)) is None:
+            return False
+        # Un CSV editado a mano también cuenta como vencido
+        return cache.huella_archivo(ruta, anterior.get("huella"))["sha1"] == anterior.get("huella", {}).get("sha1")
+
+    def agregados(self, contenido_cubo, contenido_dimensiones):
+        pendientes = {}
+        for nombre in SALIDAS:
+            entradas = hash_texto(VERSION_CONSTRUCCION, hash_codigo(process.AGREGADOS[nombre]),
+                                  contenido_cubo, contenido_dimensiones)
+            nodo_salida = f"salida:{SALIDAS[nombre]}"
+            ruta = os.path.join(self.directorio, f"{SALIDAS[nombre]}.csv")
+            anterior = self.anterior.get(nombre, {})
+            if self.vigente(nombre, entradas) and self.salida_vigente(
+                    nodo_salida, hash_texto(anterior.get("contenido")), ruta):
+                self.conservar(nombre)
+                self.conservar(nodo_salida)
+            else:
+                pendientes[nombre] = entradas
+        if not pendientes:
+            return
+        if self.simular:
+            for nombre, entradas in pendientes.items():
+                self.pendiente(f"salida:{SALIDAS[nombre]}", self.pendiente(nombre, entradas))
+            return
+
+        for nombre, df in self.calcular(list(pendientes)):
+            self.escribir(nombre, pendientes[nombre], df)
+
+    def escribir(self, nombre, entradas, df):
+        """Registra el agregado recalculado y reescribe su salida solo si el contenido cambió."""
+        contenido = self.registrar(nombre, entradas, hash_marco(df))
+        nodo_salida = f"salida:{SALIDAS[nombre]}"
+        ruta = os.path.join(self.directorio, f"{SALIDAS[nombre]}.csv")
+        if self.salida_vigente(nodo_salida, hash_texto(contenido), ruta):
+            self.conservar(nodo_salida)
+            return
+        escribir_salida(df, ruta)
+        self.registrar(nodo_salida, hash_texto(contenido), hash_texto(contenido),
+                       huella=cache.huella_archivo(ruta))
+
+    def rutas_geometria(self):
+        rutas = {nivel: geometria.ruta_nivel(nivel) for nivel in geometria.NIVELES}
+        # Niveles del mapa municipal, si se prepararon (python geometria.py municipios)
+        rutas.update({f"municipios_{nivel}": geometria.ruta_nivel(nivel, "municipios")
+                      for nivel in geometria.NIVELES_MUNICIPIOS})
+        return {nivel: ruta for nivel, ruta in rutas.items() if os.path.exists(ruta)}
+
+    def almacen(self, contenido_cubo, contenido_dimensiones):
+        """info/almacen.bin con las salidas, el cubo, las dimensiones y la geometría."""
+        rutas_salida = {nombre: os.path.join(self.directorio, f"{archivo}.csv") for nombre, archivo in SALIDAS.items()}
+        rutas_geo = self.rutas_geometria()
+        huellas_geo = {nivel: cache.huella_archivo(ruta) for nivel, ruta in rutas_geo.items()}
+        entradas = hash_texto(VERSION_CONSTRUCCION, almacen.VERSION_ALMACEN, contenido_cubo, contenido_dimensiones,
+                              *(self.estado[f"salida:{archivo}"]["contenido"] for archivo in SALIDAS.values()),
+                              *(f"{nivel}:{huella['sha1']}" for nivel, huella in sorted(huellas_geo.items())))
+        ruta = os.path.join(self.directorio, ARCHIVO_ALMACEN)
+        if self.vigente('almacen', entradas, os.path.exists(ruta)):
+            return self.conservar('almacen')
+        if self.simular:
+            return self.pendiente('almacen', entradas)
+        cubo, dimensiones = self.cubo_y_dimensiones()
+        leer = lambda r: pd.read_csv(r, sep='|', encoding='latin1')
+        marcos = {f"salida:{archivo}": cache.leer_salida(rutas_salida[nombre], leer)
+                  for nombre, archivo in SALIDAS.items()}
+        marcos["cubo"] = cubo
+        marcos.update({f"dimension:{nombre}": dim for nombre, dim in dimensiones.items()})
+        blobs = {}
+        for nivel, ruta_geo in rutas_geo.items():
+            with open(ruta_geo, "rb") as f:
+                blobs[f"geo:{nivel}"] = f.read()
+        huellas = {os.path.basename(r): cache.huella_archivo(r) for r in rutas_salida.values()}
+        huellas.update({os.path.basename(rutas_geo[nivel]): huella for nivel, huella in huellas_geo.items()})
+        almacen.guardar_almacen(ruta, marcos, blobs, {"huellas": huellas})
+        return self.registrar('almacen', entradas, entradas)
+
+    ### Ingesta de deltas
+
+    def proyecciones(self, cubo, contenido_cubo):
+        """Proyecciones de ingesta.PROYECCIONES guardadas para este cubo; las que falten se calculan."""
+        proyecciones = {}
+        for nombre in ingesta.PROYECCIONES:
+            directorio = os.path.join(self.directorio_cubo, "proyecciones", nombre)
+            meta = cache.leer_meta(directorio)
+            if meta and meta.get("cubo") == contenido_cubo:
+                proyecciones[nombre] = cache.cargar_marco(directorio, meta, mmap=False)
+            else:
+                proyecciones[nombre] = ingesta.proyeccion(cubo, nombre)
+        return proyecciones
+
+    def guardar_proyeccion(self, nombre, proyeccion, contenido_cubo):
+        cache.guardar_marco(proyeccion, os.path.join(self.directorio_cubo, "proyecciones", nombre),
+                            {"cubo": contenido_cubo})
+
+    def ingerir(self, ruta):
+        """Aplica el delta `ruta` al cubo y a los agregados que toca; devuelve los nodos reconstruidos.
+
+        Falla con ValueError, sin escribir nada, si el delta ya se ingirió
+        (mismo contenido que uno de info/deltas/), trae registros inválidos o
+        retira registros que no están en el cubo.
+        """
+        # Primero se pone al día el grafo (no hace nada si ya lo estaba)
+        fuentes = {nombre: self.fuente(nombre, r) for nombre, r in self.rutas_fuente().items()}
+        # El hash de cada delta ingerido es el de su nodo fuente: volver a sumar uno duplicaría sus conteos
+        contenido_delta = cache.hash_archivo(ruta)
+        repetido = next((nombre for nombre, contenido in fuentes.items()
+                         if nombre.startswith('delta:') and contenido == contenido_delta), None)
+        if repetido:
+            raise ValueError(f"{ruta} ya se ingirió como {repetido[len('delta:'):]} (mismo contenido)")
+        contenido_dimensiones = self.dimensiones(fuentes)
+        contenido_anterior = self.cubo(fuentes)
+        self.agregados(contenido_anterior, contenido_dimensiones)
+        cubo, dimensiones = self.cubo_y_dimensiones()
+
+        delta = ingesta.leer_delta(ruta)
+        invalidos = ingesta.validar_delta(delta, dimensiones)
+        if len(invalidos):
+            motivos = invalidos['motivo'].value_counts().head(5).to_dict()
+            raise ValueError(f"{ruta} tiene {len(invalidos)} registros inválidos: {motivos}")
+        celdas = ingesta.cubo_delta(delta, cubo)
+        proyecciones = self.proyecciones(cubo, contenido_anterior)
+        cubo = ingesta.aplicar_delta(cubo, celdas)
+        parciales = {nombre: ingesta.proyeccion_delta(celdas, nombre) for nombre in ingesta.PROYECCIONES}
+        for nombre, parcial in parciales.items():
+            proyecciones[nombre] = ingesta.aplicar_delta(
+                proyecciones[nombre], parcial, ingesta.PROYECCIONES[nombre][0])
+        if self.simular:
+            return self.reconstruidos + ['cubo'] + [nombre for nombre, parcial in parciales.items() if len(parcial)]
+
+        # El delta es válido: se guarda como fuente del cubo y se escribe lo que cambió
+        os.makedirs(self.directorio_deltas, exist_ok=True)
+        destino = os.path.join(self.directorio_deltas, f"{len(self.deltas()) + 1:04d}_{os.path.basename(ruta)}")
+        shutil.copyfile(ruta, destino)
+        nodo_delta = f"delta:{os.path.basename(destino)}"
+        fuentes[nodo_delta] = self.fuente(nodo_delta, destino)
+        process.guardar_conteos(self.directorio_cubo, cubo)
+        self.proceso.fijar(cubo=cubo, dimensiones=dimensiones)
+        contenido_cubo = self.registrar('cubo', self.entradas_cubo(fuentes), hash_marco(cubo))
+        for nombre in SALIDAS:
+            entradas = hash_texto(VERSION_CONSTRUCCION, hash_codigo(process.AGREGADOS[nombre]),
+                                  contenido_cubo, contenido_dimensiones)
+            if len(parciales[nombre]):
+                self.escribir(nombre, entradas, process.AGREGADOS[nombre](proyecciones[nombre], dimensiones))
+            else:
+                # Su proyección no cambió, así que el agregado y su salida tampoco
+                self.estado[nombre] = dict(self.estado[nombre], entradas=entradas)
+            self.guardar_proyeccion(nombre, proyecciones[nombre], contenido_cubo)
+        self.almacen(contenido_cubo, contenido_dimensiones)
+        self.guardar_estado()
+        return self.reconstruidos
+
+    def cubo_y_dimensiones(self):
+        """Cubo y dimensiones ya calculados en este proceso o, si no, los guardados en info/cubo."""
+        if {'cubo', 'dimensiones'} <= set(self.proceso.calculadas()):
+            return self.proceso.cubo, self.proceso.dimensiones
+        # Nodos vigentes: se leen de info/cubo en lugar de volver a las bases crudas
+        return process.cargar_cubo(self.directorio_cubo)
+
+    def calcular(self, nombres):
+        """Calcula los agregados pedidos en este proceso.
+
+        Son proyecciones baratas del cubo: enviar el cubo a otros procesos
+        costaría más que calcularlas. Los procesos (--trabajadores) se usan
+        para los cubos anuales de --multianual.
+        """
+        cubo, dimensiones = self.cubo_y_dimensiones()
+        return [(nombre, process.AGREGADOS[nombre](cubo, dimensiones)) for nombre in nombres]
+
+    def ejecutar(self):
+        """Recorre el grafo en orden; devuelve la lista de nodos reconstruidos."""
+        fuentes = {nombre: self.fuente(nombre, ruta) for nombre, ruta in self.rutas_fuente().items()}
+        contenido_dimensiones = self.dimensiones(fuentes)
+        contenido_cubo = self.cubo(fuentes)
+        self.agregados(contenido_cubo, contenido_dimensiones)
+        self.almacen(contenido_cubo, contenido_dimensiones)
+        if not self.simular:
+            self.guardar_estado()
+        return self.reconstruidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directorio", default="info")
+    parser.add_argument("--trabajadores", type=int, help="Procesos para los cubos anuales de --multianual (por defecto, uno por CPU)")
+    parser.add_argument("--tamano-bloque", type=int, help="Construir el cubo leyendo NoFetal por bloques")
+    parser.add_argument("--multianual", action="store_true", help="Sumar todos los NoFetal<año>.csv")
+    parser.add_argument("--forzar", action="store_true", help="Ignorar el estado y reconstruir todo")
+    parser.add_argument("--simular", action="store_true", help="Solo listar los nodos que se reconstruirían")
+    parser.add_argument("--ingerir", metavar="DELTA", help="Aplicar un CSV de altas y bajas (ver ingesta.py)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    construccion = Construccion(args.directorio, args.trabajadores, args.tamano_bloque,
+                                args.multianual, args.forzar, args.simular)
+    try:
+        reconstruidos = construccion.ingerir(args.ingerir) if args.ingerir else construccion.ejecutar()
+    except ValueError as error:
+        # Delta inválido: no se escribió nada
+        parser.exit(1, f"{error}\n")
+    verbo = "Se reconstruirían" if args.simular else "Reconstruidos"
+    vigentes = [nodo for nodo in construccion.estado if nodo not in reconstruidos]
+    print(f"{verbo}: {', '.join(reconstruidos) or 'ninguno'}")
+    print(f"Vigentes: {', '.join(vigentes) or 'ninguno'}")
+
+
+if __name__ == "__main__":
+    main()
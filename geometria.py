@@ -0,0 +1,271 @@
+"""Preparación offline de la geometría de los departamentos para el mapa.
+
+Genera versiones simplificadas de departamentos_colombia.geojson en varios
+niveles de detalle (geo/departamentos_<nivel>.geojson). La simplificación
+preserva la topología: los bordes compartidos entre dos departamentos se
+simplifican una sola vez y de la misma forma para ambos, así que no quedan
+huecos ni solapes entre vecinos. Las coordenadas se cuantizan y solo se
+conserva la propiedad `name`.
+
+Con el argumento `municipios` hace lo mismo con el GeoJSON municipal del
+DANE (geo/municipios_<nivel>.geojson, niveles más finos), conservando
+`name` y `codigo`, el código DIVIPOLA de 5 dígitos que usa mapa_municipal.
+
+Uso: python geometria.py
+     python geometria.py municipios [municipios_colombia.geojson]
+"""
+import json
+import os
+import sys
+
+import pandas as pd
+
+ORIGEN = "departamentos_colombia.geojson"
+DIRECTORIO_GEO = "geo"
+
+# Tolerancia de simplificación (grados) y decimales de las coordenadas por nivel
+NIVELES = {
+    "alta": {"tolerancia": 0.002, "decimales": 4},
+    "media": {"tolerancia": 0.01, "decimales": 3},
+    "baja": {"tolerancia": 0.03, "decimales": 3},
+}
+
+# El GeoJSON municipal no viene con el repositorio (MGN del DANE)
+ORIGEN_MUNICIPIOS = "municipios_colombia.geojson"
+# Los municipios se ven con más zoom: niveles más finos que los de departamentos
+NIVELES_MUNICIPIOS = {
+    "alta": {"tolerancia": 0.0005, "decimales": 5},
+    "media": {"tolerancia": 0.003, "decimales": 4},
+    "baja": {"tolerancia": 0.015, "decimales": 3},
+}
+# Propiedades en las que distintas versiones del MGN traen el código DIVIPOLA del municipio
+PROPIEDADES_CODIGO = ("MPIO_CDPMP", "MPIO_CCNCT", "codigo")
+PROPIEDADES_NOMBRE = ("MPIO_CNMBR", "name")
+
+
+def ruta_nivel(nivel, prefijo="departamentos"):
+    return os.path.join(DIRECTORIO_GEO, f"{prefijo}_{nivel}.geojson")
+
+
+def grados_por_pixel(zoom):
+    """Ancho aproximado de un pixel, en grados, a un nivel de zoom de mapbox."""
+    return 360 / (512 * 2 ** zoom)
+
+
+def nivel_para_zoom(zoom, niveles=NIVELES):
+    """El nivel más simplificado cuyo error no supera un pixel a ese zoom."""
+    por_tolerancia = sorted(niveles, key=lambda n: niveles[n]["tolerancia"], reverse=True)
+    for nivel in por_tolerancia:
+        if niveles[nivel]["tolerancia"] <= grados_por_pixel(zoom):
+            return nivel
+    return por_tolerancia[-1]
+
+
+### Douglas-Peucker sobre una secuencia de puntos
+
+def _distancia_segmento(p, a, b):
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return ((px - ax) ** 2 + (py - ay) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return ((px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2) ** 0.5
+
+
+def douglas_peucker(puntos, tolerancia):
+    """Simplifica una línea conservando siempre sus extremos."""
+    if len(puntos) < 3:
+        return list(puntos)
+    conservar = [False] * len(puntos)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, len(puntos) - 1)]
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        mayor, indice = 0.0, None
+        for i in range(inicio + 1, fin):
+            d = _distancia_segmento(puntos[i], puntos[inicio], puntos[fin])
+            if d > mayor:
+                mayor, indice = d, i
+        if indice is not None and mayor > tolerancia:
+            conservar[indice] = True
+            pendientes.append((inicio, indice))
+            pendientes.append((indice, fin))
+    return [p for p, c in zip(puntos, conservar) if c]
+
+
+### Simplificación por arcos compartidos
+
+def _poligonos(geometria):
+    poligonos = geometria["coordinates"] if geometria["type"] == "MultiPolygon" else [geometria["coordinates"]]
+    return poligonos
+
+
+def _cuantizar_anillo(anillo, decimales):
+    puntos = []
+    for x, y in anillo:
+        p = (round(x, decimales), round(y, decimales))
+        if not puntos or p != puntos[-1]:
+            puntos.append(p)
+    if len(puntos) > 1 and puntos[0] == puntos[-1]:
+        puntos.pop()
+    return puntos
+
+
+def _cerrar(anillo):
+    return [list(p) for p in anillo + anillo[:1]]
+
+
+def _arista(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+class Simplificador:
+    """Simplifica un conjunto de anillos respetando los bordes que comparten."""
+
+    def __init__(self, anillos, tolerancia):
+        self.anillos = anillos
+        self.tolerancia = tolerancia
+        self.anillos_por_arista = {}
+        self.anillos_por_punto = {}
+        for i, anillo in enumerate(anillos):
+            for j, p in enumerate(anillo):
+                q = anillo[(j + 1) % len(anillo)]
+                self.anillos_por_arista.setdefault(_arista(p, q), set()).add(i)
+                self.anillos_por_punto.setdefault(p, set()).add(i)
+        self._arcos = {}
+
+    def _es_union(self, anillo, j):
+        # Un punto separa arcos si cambian los anillos que comparten el borde
+        # antes y después de él, o si otro anillo lo toca solo en ese punto
+        p = anillo[j]
+        antes = self.anillos_por_arista[_arista(anillo[j - 1], p)]
+        despues = self.anillos_por_arista[_arista(p, anillo[(j + 1) % len(anillo)])]
+        return antes != despues or self.anillos_por_punto[p] != antes
+
+    def _simplificar_arco(self, arco):
+        # El mismo arco recorrido en sentido contrario debe dar el mismo resultado
+        invertido = arco[0] > arco[-1]
+        clave = tuple(reversed(arco)) if invertido else tuple(arco)
+        if clave not in self._arcos:
+            self._arcos[clave] = douglas_peucker(list(clave), self.tolerancia)
+        resultado = self._arcos[clave]
+        return list(reversed(resultado)) if invertido else resultado
+
+    def _simplificar_cerrado(self, anillo):
+        # Anillo sin uniones: se parte en su punto mínimo y el más lejano a él
+        inicio = anillo.index(min(anillo))
+        anillo = anillo[inicio:] + anillo[:inicio]
+        if anillo[1] > anillo[-1]:
+            anillo = [anillo[0]] + anillo[:0:-1]
+        x0, y0 = anillo[0]
+        lejano = max(range(len(anillo)), key=lambda i: (anillo[i][0] - x0) ** 2 + (anillo[i][1] - y0) ** 2)
+        primera = self._simplificar_arco(anillo[:lejano + 1])
+        segunda = self._simplificar_arco(anillo[lejano:] + [anillo[0]])
+        return primera[:-1] + segunda[:-1]
+
+    def simplificar(self, i):
+        anillo = self.anillos[i]
+        if len(anillo) < 4:
+            return anillo
+        uniones = [j for j in range(len(anillo)) if self._es_union(anillo, j)]
+        if not uniones:
+            return self._simplificar_cerrado(anillo)
+        resultado = []
+        for k, inicio in enumerate(uniones):
+            fin = uniones[(k + 1) % len(uniones)]
+            arco = anillo[inicio:fin + 1] if fin > inicio else anillo[inicio:] + anillo[:fin + 1]
+            resultado.extend(self._simplificar_arco(arco)[:-1])
+        return resultado
+
+
+def simplificar_geojson(geojson, tolerancia, decimales, propiedades=("name",)):
+    """Devuelve una copia simplificada del FeatureCollection con solo las `propiedades` pedidas."""
+    anillos, estructura = [], []
+    for feature in geojson["features"]:
+        poligonos = []
+        for poligono in _poligonos(feature["geometry"]):
+            indices = []
+            for anillo in poligono:
+                indices.append(len(anillos))
+                anillos.append(_cuantizar_anillo(anillo, decimales))
+            poligonos.append(indices)
+        estructura.append(({clave: feature["properties"][clave] for clave in propiedades}, poligonos))
+
+    simplificador = Simplificador(anillos, tolerancia)
+    features = []
+    for valores, poligonos in estructura:
+        coordenadas = []
+        for indices in poligonos:
+            exterior = simplificador.simplificar(indices[0])
+            if len(exterior) < 3:
+                continue  # Islas más pequeñas que la tolerancia
+            poligono = [_cerrar(exterior)]
+            for i in indices[1:]:
+                hueco = simplificador.simplificar(i)
+                if len(hueco) >= 3:
+                    poligono.append(_cerrar(hueco))
+            coordenadas.append(poligono)
+        if not coordenadas:
+            # Nunca se pierde un feature: se deja su anillo exterior cuantizado
+            coordenadas = [[_cerrar(anillos[poligonos[0][0]])]]
+        features.append({
+            "type": "Feature",
+            "properties": valores,
+            "geometry": {"type": "MultiPolygon", "coordinates": coordenadas},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def verificar_departamentos(geojson, departamentos):
+    """Falla si algún departamento no tiene un feature con el mismo `name`."""
+    nombres = {f["properties"]["name"] for f in geojson["features"]}
+    faltantes = sorted(set(departamentos) - nombres)
+    if faltantes:
+        raise ValueError(f"Departamentos sin geometría en el GeoJSON: {faltantes}")
+
+
+def guardar_geojson(geojson, ruta):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, separators=(",", ":"), ensure_ascii=False)
+
+
+def preparar_niveles(origen=ORIGEN, mapa="info/mapa.csv", niveles=NIVELES):
+    with open(origen, encoding="utf-8") as f:
+        geojson = json.load(f)
+    departamentos = pd.read_csv(mapa, sep='|', encoding='latin1')["departamento"]
+    for nivel, parametros in niveles.items():
+        simplificado = simplificar_geojson(geojson, **parametros)
+        verificar_departamentos(simplificado, departamentos)
+        ruta = ruta_nivel(nivel)
+        guardar_geojson(simplificado, ruta)
+        print(f"{nivel}: {os.path.getsize(ruta) / 1024:.0f} KB ({ruta})")
+
+
+def normalizar_municipios(geojson):
+    """Deja en cada feature municipal `codigo` (DIVIPOLA de 5 dígitos) y `name`."""
+    for feature in geojson["features"]:
+        propiedades = feature["properties"]
+        codigo = next((propiedades[c] for c in PROPIEDADES_CODIGO if propiedades.get(c) is not None), None)
+        if codigo is None:
+            raise ValueError(f"Feature municipal sin código DIVIPOLA ({', '.join(PROPIEDADES_CODIGO)}): {propiedades}")
+        nombre = next((propiedades[c] for c in PROPIEDADES_NOMBRE if propiedades.get(c)), "")
+        feature["properties"] = {"codigo": f"{int(codigo):05d}", "name": str(nombre).title()}
+    return geojson
+
+
+def preparar_municipios(origen=ORIGEN_MUNICIPIOS, niveles=NIVELES_MUNICIPIOS):
+    with open(origen, encoding="utf-8") as f:
+        geojson = normalizar_municipios(json.load(f))
+    for nivel, parametros in niveles.items():
+        simplificado = simplificar_geojson(geojson, **parametros, propiedades=("codigo", "name"))
+        ruta = ruta_nivel(nivel, "municipios")
+        guardar_geojson(simplificado, ruta)
+        print(f"{nivel}: {os.path.getsize(ruta) / 1024:.0f} KB ({ruta})")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["municipios"]:
+        preparar_municipios(*sys.argv[2:3])
+    else:
+        preparar_niveles(*sys.argv[1:2])
@@ -0,0 +1,17 @@
+"""Configuración de gunicorn (Procfile: gunicorn app:server -c gunicorn.conf.py).
+
+app.py se importa una sola vez en el proceso maestro y los workers se crean
+con fork: los DataFrame de info/almacen.bin son vistas sobre un mmap de
+solo lectura y el resto de objetos se comparte por copia en escritura.
+"""
+import gc
+import os
+
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+
+def pre_fork(server, worker):
+    # Saca los objetos del arranque de las generaciones del recolector: sin esto
+    # la primera recolección de cada worker escribe en todas sus páginas y las copia
+    gc.freeze()
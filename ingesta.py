@@ -0,0 +1,158 @@
+"""Ingesta incremental de entregas parciales del DANE (altas y bajas de registros).
+
+Un delta es un CSV con el formato de NoFetal (';' y los mismos nombres de
+columna) y, opcionalmente, una columna SIGNO: 1 agrega el registro y -1 lo
+retira. Una corrección es la baja del registro anterior más el alta del
+nuevo. Sin SIGNO todos los registros son altas.
+
+El delta se valida contra las dimensiones y se reduce a un cubo con signo
+(cubo_delta). aplicar_delta lo suma al cubo celda a celda, con una búsqueda
+por índice, sin reagrupar el cubo ni releer las bases. Cada agregado del
+tablero depende solo de una proyección pequeña del cubo (PROYECCIONES): se
+parchan las proyecciones que el delta toca y solo esos agregados se
+recalculan, sobre su proyección. construir.py --ingerir orquesta todo y
+rechaza un delta con el mismo contenido que uno ya ingerido.
+
+Los deltas ingeridos (info/deltas/) se vuelven a aplicar en cada
+reconstrucción del cubo. Cuando llega el archivo consolidado del año, que
+ya los incluye, los deltas de ese año se retiran de info/deltas/ para no
+contarlos dos veces.
+"""
+import numpy as np
+import pandas as pd
+
+import process
+
+# Proyección del cubo de la que depende cada agregado: (columnas, prefijo CIE-10 o None).
+# Todos los agregados dan el mismo resultado sobre su proyección que sobre el cubo completo.
+PROYECCIONES = {
+    'data_mapa': (['ano', 'cod_departamento'], None),
+    'grafico_lineal': (['mes'], None),
+    # grafico_barras solo mira los homicidios X95 (ver process.grafico_barras)
+    'grafico_barras': (['cod_departamento', 'cod_municipio', 'cod_muerte'], 'X95'),
+    'grafico_circular': (['cod_departamento', 'cod_municipio'], None),
+    'grafico_apiladas': (['cod_departamento', 'sexo'], None),
+    'histograma': (['grupo_edad1'], None),
+    'tabla': (['cod_muerte'], None),
+}
+
+ESQUEMA_DELTA = dict(process.ESQUEMA_NOFETAL, signo='Int8')
+
+
+def leer_delta(ruta):
+    """Registros del delta con las columnas del cubo y `signo` (1 si el archivo no la trae)."""
+    encabezado = pd.read_csv(ruta, sep=';', nrows=0).columns
+    normalizados = {process.quitar_tildes(process.normalizar_nombre(col)) for col in encabezado}
+    esquema = ESQUEMA_DELTA if 'signo' in normalizados else process.ESQUEMA_NOFETAL
+    bloques = list(process.leer_por_bloques(ruta, esquema=esquema))
+    delta = pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(
+        {col: pd.Series(dtype=tipo) for col, tipo in esquema.items()})
+    if 'signo' not in delta.columns:
+        delta['signo'] = pd.array(np.ones(len(delta), dtype=np.int8), dtype='Int8')
+    delta['cod_muerte'] = delta['cod_muerte'].astype(object)
+    return delta
+
+
+def validar_delta(delta, dimensiones):
+    """Registros inválidos del delta con el motivo del primer problema encontrado.
+
+    Se exige que cada registro tenga año, un municipio de DIVIPOLA, una causa
+    CIE-10 conocida (de 3 o 4 caracteres), sexo, mes y grupo de edad válidos,
+    y signo 1 o -1.
+    """
+    motivo = pd.Series(None, index=delta.index, dtype=object)
+
+    def marcar(invalidos, texto):
+        motivo[np.asarray(invalidos) & motivo.isna().to_numpy()] = texto
+
+    for col in ['signo', 'mes', 'sexo', 'grupo_edad1', 'cod_municipio', 'cod_departamento', 'ano', 'cod_muerte']:
+        marcar(delta[col].isna(), f"{col} vacío")
+    enteros = {col: delta[col].fillna(-1).to_numpy(dtype=np.int64)
+               for col in ['signo', 'mes', 'sexo', 'grupo_edad1', 'cod_departamento', 'cod_municipio']}
+    marcar(~np.isin(enteros['signo'], [1, -1]), "signo distinto de 1 y -1")
+    marcar((enteros['mes'] < 1) | (enteros['mes'] > 12), "mes fuera de 1..12")
+    marcar(~np.isin(enteros['sexo'], [1, 2, 3]), "sexo desconocido")
+    marcar((enteros['grupo_edad1'] < 0) | (enteros['grupo_edad1'] >= len(process._CATEGORIA_POR_CODIGO)),
+           "grupo_edad1 fuera de los códigos DANE")
+    municipio = pd.MultiIndex.from_arrays([enteros['cod_departamento'], enteros['cod_municipio']])
+    marcar(dimensiones['municipios'].index.get_indexer(municipio) < 0, "municipio fuera de DIVIPOLA")
+    causas = dimensiones['causas'].index
+    if 'causas_detalle' in dimensiones:
+        causas = causas.append(dimensiones['causas_detalle'].index)
+    marcar(~delta['cod_muerte'].astype(str).isin(causas.astype(str)), "causa fuera de la CIE-10")
+    invalidos = motivo.notna()
+    return delta[invalidos].assign(motivo=motivo[invalidos])
+
+
+def cubo_delta(delta, cubo=None):
+    """Cubo con signo del delta: altas menos bajas por celda, sin las celdas que se anulan.
+
+    Con `cubo` las columnas toman sus tipos, para poder buscarlas en él.
+    """
+    celdas = (
+        delta.groupby(process.DIMENSIONES_CUBO, dropna=False, sort=False, observed=True)['signo']
+        .sum()
+        .astype(np.int64)
+        .reset_index(name='total'))
+    celdas = celdas[celdas['total'] != 0].reset_index(drop=True)
+    if cubo is not None:
+        tipos = {col: cubo[col].dtype for col in process.DIMENSIONES_CUBO
+                 if not isinstance(cubo[col].dtype, pd.CategoricalDtype)}
+        celdas = celdas.astype(tipos)
+    return celdas
+
+
+def aplicar_delta(tabla, delta, claves=process.DIMENSIONES_CUBO):
+    """Suma `delta` a `tabla` (ambas con `claves` y total) celda a celda.
+
+    Las celdas que ya existen se actualizan en su lugar, las nuevas se
+    agregan al final y las que quedan en cero se eliminan. Falla si una baja
+    deja una celda en negativo (se retiran registros que no estaban).
+    """
+    if delta.empty:
+        return tabla
+    # Solo se indexan las celdas cuyas claves enteras aparecen en el delta (una entrega
+    # mensual toca un año y un mes): el resto del cubo no puede coincidir
+    candidatas = np.ones(len(tabla), dtype=bool)
+    for col in claves:
+        if pd.api.types.is_integer_dtype(tabla[col].dtype):
+            valores = tabla[col].to_numpy(dtype=np.int64, na_value=-1)
+            candidatas &= np.isin(valores, delta[col].to_numpy(dtype=np.int64, na_value=-1))
+    candidatas = np.flatnonzero(candidatas)
+    if len(claves) == 1:
+        indice = pd.Index(tabla[claves[0]].to_numpy()[candidatas])
+        posiciones = indice.get_indexer(pd.Index(delta[claves[0]]))
+    else:
+        indice = pd.MultiIndex.from_frame(tabla.iloc[candidatas][claves])
+        posiciones = indice.get_indexer(pd.MultiIndex.from_frame(delta[claves]))
+    posiciones = np.where(posiciones >= 0, candidatas.take(np.maximum(posiciones, 0)), -1)
+    existentes = posiciones >= 0
+    totales = tabla['total'].to_numpy(dtype=np.int64, copy=True)
+    np.add.at(totales, posiciones[existentes], delta['total'].to_numpy()[existentes])
+    nuevas = delta[~existentes]
+    if (totales < 0).any() or (nuevas['total'] < 0).any():
+        raise ValueError("El delta retira más registros de los que hay en alguna celda del cubo")
+    actualizada = tabla.assign(total=totales.astype(tabla['total'].dtype))
+    if (totales == 0).any():
+        actualizada = actualizada[totales != 0]
+    nuevas = nuevas[nuevas['total'] != 0]
+    if nuevas.empty:
+        return actualizada.reset_index(drop=True)
+    return pd.concat([actualizada, nuevas[list(tabla.columns)]], ignore_index=True)
+
+
+def proyeccion(cubo, nombre):
+    """Proyección del cubo de la que depende el agregado `nombre`."""
+    columnas, prefijo = PROYECCIONES[nombre]
+    if prefijo:
+        cubo = cubo.iloc[np.sort(process.indice_causas(cubo).posiciones(prefijo))]
+    return process.proyectar(cubo, columnas)
+
+
+def proyeccion_delta(celdas, nombre):
+    """La misma proyección, sobre un cubo con signo; sin las celdas que se anulan."""
+    columnas, prefijo = PROYECCIONES[nombre]
+    if prefijo:
+        celdas = celdas[celdas['cod_muerte'].astype(str).str.startswith(prefijo)]
+    parcial = process.proyectar(celdas, columnas)
+    return parcial[parcial['total'] != 0].reset_index(drop=True)
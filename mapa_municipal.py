@@ -0,0 +1,186 @@
+"""Mapa coroplético municipal que solo envía al navegador los polígonos visibles.
+
+Los ~1.100 municipios no caben en la figura como el GeoJSON de departamentos.
+Un R-tree empaquetado con Sort-Tile-Recursive (IndiceEspacial) sobre las
+cajas de los municipios responde qué polígonos tocan la vista actual; el
+callback de relayoutData del mapa pide solo esos, al nivel de simplificación
+de geo/municipios_<nivel>.geojson que corresponde al zoom (geometria.py).
+Con poco zoom se ven muchos municipios pero muy simplificados; con mucho
+zoom, pocos y con detalle, así que la respuesta queda acotada a cualquier zoom.
+"""
+import math
+
+import numpy as np
+
+import geometria
+
+TAMANO_NODO = 16
+# Vista supuesta cuando relayoutData no trae las esquinas (pixeles del gráfico)
+ANCHO_VISTA, ALTO_VISTA = 1200, 700
+# Margen alrededor de la vista, en fracciones de su ancho y alto: al desplazar un poco
+# el mapa los municipios vecinos ya están en la figura
+MARGEN = 0.25
+VISTA_INICIAL = {"centro": {"lat": 4.5, "lon": -74.1}, "zoom": 5}
+
+
+def codigo_divipola(departamentos, municipios):
+    """Códigos DIVIPOLA de 5 dígitos ("05001") a partir de los códigos de departamento y municipio."""
+    return [f"{int(d):02d}{int(m):03d}" for d, m in zip(departamentos, municipios)]
+
+
+def caja_feature(feature):
+    """(minx, miny, maxx, maxy) de un feature Polygon o MultiPolygon."""
+    puntos = np.array([punto for poligono in geometria._poligonos(feature["geometry"])
+                       for anillo in poligono for punto in anillo], dtype=float)
+    return (*puntos.min(axis=0)[:2], *puntos.max(axis=0)[:2])
+
+
+### R-tree empaquetado con Sort-Tile-Recursive
+
+def _orden_str(cajas, tamano_nodo):
+    """Orden de las cajas en el que cada tramo de `tamano_nodo` forma un nodo compacto."""
+    hojas = math.ceil(len(cajas) / tamano_nodo)
+    por_franja = math.ceil(math.sqrt(hojas)) * tamano_nodo
+    centro_x = (cajas[:, 0] + cajas[:, 2]) / 2
+    centro_y = (cajas[:, 1] + cajas[:, 3]) / 2
+    # Franjas verticales por x y, dentro de cada franja, orden por y
+    por_x = np.argsort(centro_x, kind="stable")
+    franja = np.empty(len(cajas), dtype=np.int64)
+    franja[por_x] = np.arange(len(cajas)) // por_franja
+    return np.lexsort((centro_y, franja))
+
+
+def _agrupar(cajas, tamano_nodo):
+    """Cajas de los nodos padre de cada tramo consecutivo de `tamano_nodo`."""
+    inicios = np.arange(0, len(cajas), tamano_nodo)
+    return np.column_stack([
+        np.minimum.reduceat(cajas[:, 0], inicios), np.minimum.reduceat(cajas[:, 1], inicios),
+        np.maximum.reduceat(cajas[:, 2], inicios), np.maximum.reduceat(cajas[:, 3], inicios)])
+
+
+class IndiceEspacial:
+    """R-tree de cajas (minx, miny, maxx, maxy) empaquetado con Sort-Tile-Recursive.
+
+    Se arma una sola vez (las geometrías no cambian) con nodos llenos, y
+    consultar() baja nivel por nivel solo por los nodos cuya caja toca la
+    consultada.
+    """
+
+    def __init__(self, cajas, tamano_nodo=TAMANO_NODO):
+        cajas = np.asarray(cajas, dtype=float).reshape(-1, 4)
+        self.tamano_nodo = tamano_nodo
+        orden = _orden_str(cajas, tamano_nodo)
+        self.ids = orden
+        # niveles[0] son las cajas de las hojas; cada nivel siguiente agrupa tramos del anterior
+        self.niveles = [cajas[orden]]
+        # hijos[i][j] = posición (en niveles[i]) del primer hijo del nodo j de niveles[i + 1]
+        self.hijos = []
+        while len(self.niveles[-1]) > 1:
+            actual = self.niveles[-1]
+            padres = _agrupar(actual, tamano_nodo)
+            inicios = np.arange(0, len(actual), tamano_nodo)
+            orden = _orden_str(padres, tamano_nodo)
+            self.hijos.append(inicios[orden])
+            self.niveles.append(padres[orden])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def consultar(self, caja):
+        """Posiciones (en el orden original) de las cajas que tocan `caja`, ordenadas."""
+        if not len(self):
+            return np.array([], dtype=np.int64)
+        minx, miny, maxx, maxy = caja
+        nodos = np.arange(len(self.niveles[-1]))
+        for nivel in range(len(self.niveles) - 1, -1, -1):
+            cajas = self.niveles[nivel][nodos]
+            nodos = nodos[(cajas[:, 0] <= maxx) & (cajas[:, 2] >= minx) & (cajas[:, 1] <= maxy) & (cajas[:, 3] >= miny)]
+            if nivel == 0:
+                break
+            total = len(self.niveles[nivel - 1])
+            inicios = self.hijos[nivel - 1][nodos]
+            nodos = np.concatenate([np.arange(i, min(i + self.tamano_nodo, total)) for i in inicios]
+                                   or [np.array([], dtype=np.int64)])
+        return np.sort(self.ids[nodos])
+
+
+### Vista del mapa a partir de relayoutData
+
+def vista_relayout(relayout, anterior=None):
+    """(caja, zoom, centro) de la vista que reporta el mapa; None si el evento no la cambia.
+
+    plotly.js manda en mapbox._derived las cuatro esquinas visibles; si no
+    vienen se estiman a partir del centro y el zoom.
+    """
+    anterior = anterior or VISTA_INICIAL
+    relayout = relayout or {}
+    if not any(clave.startswith("mapbox.") for clave in relayout):
+        return None
+    zoom = relayout.get("mapbox.zoom", anterior["zoom"])
+    centro = relayout.get("mapbox.center", anterior["centro"])
+    esquinas = (relayout.get("mapbox._derived") or {}).get("coordinates")
+    if esquinas:
+        lon, lat = np.asarray(esquinas, dtype=float).T
+        return (lon.min(), lat.min(), lon.max(), lat.max()), zoom, centro
+    return caja_centro(centro, zoom), zoom, centro
+
+
+def caja_centro(centro, zoom, ancho=ANCHO_VISTA, alto=ALTO_VISTA):
+    """Caja aproximada de una vista de ancho x alto pixeles con ese centro y zoom."""
+    grados = geometria.grados_por_pixel(zoom)
+    medio_ancho = ancho * grados / 2
+    # En Mercator un pixel cubre menos latitud que longitud, en proporción cos(lat)
+    medio_alto = alto * grados * math.cos(math.radians(centro["lat"])) / 2
+    return (centro["lon"] - medio_ancho, centro["lat"] - medio_alto,
+            centro["lon"] + medio_ancho, centro["lat"] + medio_alto)
+
+
+def ampliar(caja, margen=MARGEN):
+    """La caja con el margen a cada lado, redondeada hacia afuera a una rejilla de ese margen.
+
+    El redondeo hace que vistas casi iguales den la misma caja (y el mismo
+    resultado en caché).
+    """
+    minx, miny, maxx, maxy = caja
+    paso_x = max((maxx - minx) * margen, 1e-6)
+    paso_y = max((maxy - miny) * margen, 1e-6)
+    return (math.floor(minx / paso_x - 1) * paso_x, math.floor(miny / paso_y - 1) * paso_y,
+            math.ceil(maxx / paso_x + 1) * paso_x, math.ceil(maxy / paso_y + 1) * paso_y)
+
+
+class MapaMunicipal:
+    """Niveles de geo/municipios_<nivel>.geojson con un índice espacial común."""
+
+    def __init__(self, geojsons, niveles=geometria.NIVELES_MUNICIPIOS):
+        # geojsons: nivel -> FeatureCollection con `codigo` y `name` en cada feature
+        self.niveles = {nivel: niveles[nivel] for nivel in niveles if nivel in geojsons}
+        detallado = min(self.niveles, key=lambda n: self.niveles[n]["tolerancia"])
+        features = geojsons[detallado]["features"]
+        self.codigos = [f["properties"]["codigo"] for f in features]
+        self.nombres = {f["properties"]["codigo"]: f["properties"]["name"] for f in features}
+        # Las cajas del nivel más detallado contienen las de los simplificados
+        self.indice = IndiceEspacial([caja_feature(f) for f in features])
+        self.features = {}
+        for nivel in self.niveles:
+            por_codigo = {f["properties"]["codigo"]: f for f in geojsons[nivel]["features"]}
+            self.features[nivel] = [por_codigo.get(codigo) for codigo in self.codigos]
+
+    @classmethod
+    def cargar(cls, leer):
+        """MapaMunicipal con los niveles que leer(nivel) encuentre; None si no hay ninguno."""
+        geojsons = {}
+        for nivel in geometria.NIVELES_MUNICIPIOS:
+            geojson = leer(nivel)
+            if geojson is not None:
+                geojsons[nivel] = geojson
+        return cls(geojsons) if geojsons else None
+
+    def nivel(self, zoom):
+        return geometria.nivel_para_zoom(zoom, self.niveles)
+
+    def recorte(self, caja, nivel):
+        """(códigos, FeatureCollection) de los municipios que tocan `caja`, al nivel pedido."""
+        posiciones = self.indice.consultar(caja)
+        features = [self.features[nivel][i] for i in posiciones if self.features[nivel][i] is not None]
+        codigos = tuple(f["properties"]["codigo"] for f in features)
+        return codigos, {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,189 @@
+"""Instrumentación de etapas y de peticiones, expuesta en formato Prometheus.
+
+- instrumentar / medir: tiempo, filas de entrada y salida y variación de
+  memoria (RSS) de cada etapa de process.py y de cada figura de app.py.
+- instrumentar_servidor: histogramas de latencia por ruta con los hooks
+  before/after_request de Flask y la ruta /metrics.
+
+Con METRICAS=0 el decorador devuelve la función sin envolver y los hooks no
+se registran, así que no queda ningún costo en el camino de las peticiones.
+"""
+import contextlib
+import functools
+import os
+import threading
+import time
+
+HABILITADO = os.environ.get("METRICAS", "1") != "0"
+PREFIJO = "mortalidad"
+
+# Límites (segundos) de los histogramas de latencia HTTP
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_candado = threading.Lock()
+_etapas = {}
+_latencias = {}
+_indicadores = []
+
+
+def rss_bytes():
+    """Memoria residente actual del proceso (0 si no se puede leer)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _filas(valor):
+    forma = getattr(valor, "shape", None)
+    return forma[0] if forma else None
+
+
+def registrar(etapa, segundos, filas_entrada=None, filas_salida=None, memoria_delta=0):
+    with _candado:
+        datos = _etapas.setdefault(etapa, {"llamadas": 0, "segundos": 0.0})
+        datos["llamadas"] += 1
+        datos["segundos"] += segundos
+        datos["ultima_duracion"] = segundos
+        datos["memoria_delta"] = memoria_delta
+        if filas_entrada is not None:
+            datos["filas_entrada"] = filas_entrada
+        if filas_salida is not None:
+            datos["filas_salida"] = filas_salida
+
+
+class _Medicion:
+    """Lo que se mide dentro de un bloque `with medir(...)`."""
+
+    def __init__(self, filas_entrada):
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+
+
+@contextlib.contextmanager
+def medir(etapa, filas_entrada=None):
+    """Mide un bloque; asignar `.filas_salida` al objeto devuelto para registrarlas."""
+    medicion = _Medicion(filas_entrada)
+    if not HABILITADO:
+        yield medicion
+        return
+    memoria = rss_bytes()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        registrar(etapa, time.perf_counter() - inicio, medicion.filas_entrada,
+                  medicion.filas_salida, rss_bytes() - memoria)
+
+
+def instrumentar(etapa=None):
+    """Decorador que mide cada llamada; las filas salen del primer DataFrame y del resultado."""
+    def decorador(funcion):
+        if not HABILITADO:
+            return funcion
+        nombre = etapa or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            entrada = next((_filas(a) for a in args if _filas(a) is not None), None)
+            with medir(nombre, entrada) as medicion:
+                resultado = funcion(*args, **kwargs)
+                medicion.filas_salida = _filas(resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+def indicador(nombre, ayuda, funcion):
+    """Registra un valor que se calcula al exponer /metrics (ej. aciertos de una caché)."""
+    _indicadores.append((nombre, ayuda, funcion))
+
+
+def observar_latencia(ruta, metodo, estado, segundos):
+    clave = (ruta, metodo, str(estado))
+    with _candado:
+        datos = _latencias.setdefault(clave, {"cubetas": [0] * len(LIMITES_LATENCIA), "suma": 0.0, "cuenta": 0})
+        for i, limite in enumerate(LIMITES_LATENCIA):
+            if segundos <= limite:
+                datos["cubetas"][i] += 1
+        datos["suma"] += segundos
+        datos["cuenta"] += 1
+
+
+def _etiquetas(**valores):
+    def escapar(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in valores.items()) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exponer():
+    """Todas las métricas en formato de texto de Prometheus."""
+    lineas = []
+
+    def familia(nombre, tipo, ayuda):
+        lineas.append(f"# HELP {PREFIJO}_{nombre} {ayuda}")
+        lineas.append(f"# TYPE {PREFIJO}_{nombre} {tipo}")
+
+    with _candado:
+        etapas = {k: dict(v) for k, v in _etapas.items()}
+        latencias = {k: {"cubetas": list(v["cubetas"]), "suma": v["suma"], "cuenta": v["cuenta"]}
+                     for k, v in _latencias.items()}
+
+    series = [
+        ("etapa_segundos_total", "counter", "Tiempo acumulado en cada etapa", "segundos"),
+        ("etapa_llamadas_total", "counter", "Veces que se ejecutó cada etapa", "llamadas"),
+        ("etapa_ultima_duracion_segundos", "gauge", "Duración de la última ejecución", "ultima_duracion"),
+        ("etapa_filas_entrada", "gauge", "Filas de entrada en la última ejecución", "filas_entrada"),
+        ("etapa_filas_salida", "gauge", "Filas de salida en la última ejecución", "filas_salida"),
+        ("etapa_memoria_delta_bytes", "gauge", "Variación de RSS en la última ejecución", "memoria_delta"),
+    ]
+    for nombre, tipo, ayuda, campo in series:
+        familia(nombre, tipo, ayuda)
+        for etapa, datos in sorted(etapas.items()):
+            if campo in datos:
+                lineas.append(f"{PREFIJO}_{nombre}{_etiquetas(etapa=etapa)} {_numero(datos[campo])}")
+
+    familia("http_latencia_segundos", "histogram", "Latencia de las peticiones por ruta")
+    for (ruta, metodo, estado), datos in sorted(latencias.items()):
+        base = dict(ruta=ruta, metodo=metodo, estado=estado)
+        for limite, cuenta in zip(LIMITES_LATENCIA, datos["cubetas"]):
+            lineas.append(f"{PREFIJO}_http_latencia_segundos_bucket{_etiquetas(**base, le=limite)} {cuenta}")
+        lineas.append(f"{PREFIJO}_http_latencia_segundos_bucket{_etiquetas(**base, le='+Inf')} {datos['cuenta']}")
+        lineas.append(f"{PREFIJO}_http_latencia_segundos_sum{_etiquetas(**base)} {_numero(datos['suma'])}")
+        lineas.append(f"{PREFIJO}_http_latencia_segundos_count{_etiquetas(**base)} {datos['cuenta']}")
+
+    for nombre, ayuda, funcion in _indicadores:
+        familia(nombre, "gauge", ayuda)
+        lineas.append(f"{PREFIJO}_{nombre} {_numero(funcion())}")
+    familia("rss_bytes", "gauge", "Memoria residente del proceso")
+    lineas.append(f"{PREFIJO}_rss_bytes {rss_bytes()}")
+    return "\n".join(lineas) + "\n"
+
+
+def instrumentar_servidor(servidor, ruta="/metrics"):
+    """Agrega los hooks de latencia y la ruta de métricas a un servidor Flask."""
+    if not HABILITADO:
+        return
+    import flask
+
+    @servidor.before_request
+    def _iniciar_cronometro():
+        flask.g.inicio_peticion = time.perf_counter()
+
+    @servidor.after_request
+    def _observar_peticion(respuesta):
+        inicio = getattr(flask.g, "inicio_peticion", None)
+        if inicio is not None:
+            regla = flask.request.url_rule
+            observar_latencia(regla.rule if regla else "sin_ruta", flask.request.method,
+                              respuesta.status_code, time.perf_counter() - inicio)
+        return respuesta
+
+    @servidor.route(ruta)
+    def _metricas():
+        return flask.Response(exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,130 +1,551 @@
+import collections
+import functools
+import glob
+import itertools
+import logging
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
-def quitar_tildes(texto):
-    reemplazos = {
-        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-        'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
-        'ñ': 'n', 'Ñ': 'N'}
-    if isinstance(texto, str):
-        for acento, sin_acento in reemplazos.items():
-            texto = texto.replace(acento, sin_acento)
-    return texto
-def cargar_archivos():
-    
+import cache
+import metricas
 
-    muerte = pd.read_csv("info/NoFetal2019.csv", sep=';')
-    cod = pd.read_csv("info/CodigosDeMuerte.csv", sep=';')
-    pola = pd.read_csv("info/Divipola.csv", sep=';')
+logger = logging.getLogger(__name__)
 
+# Tabla de traducción equivalente a los reemplazos de tildes y eñes
+_TABLA_TILDES = str.maketrans('áéíóúÁÉÍÓÚñÑ', 'aeiouAEIOUnN')
 
-    muerte.columns=muerte.columns.str.lower()
-    cod.columns=cod.columns.str.lower()
-    pola.columns=pola.columns.str.lower()
-    muerte.columns=muerte.columns.str.replace(' ','_')
-    cod.columns=cod.columns.str.replace(' ','_')
-    pola.columns=pola.columns.str.replace(' ','_')
+def quitar_tildes(texto):
+    if isinstance(texto, str):
+        texto = texto.translate(_TABLA_TILDES)
+    return texto
 
-    cod=cod[['capítulo', 'nombre_capítulo', 'código_de_la_cie-10_tres_caracteres',
+def normalizar_columna(serie):
+    """Quita tildes traduciendo una sola vez cada valor distinto de la columna."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # En una categórica basta con traducir las categorías
+        nuevas = [quitar_tildes(c) for c in serie.cat.categories]
+        if len(set(nuevas)) == len(nuevas):
+            return serie.cat.rename_categories(nuevas)
+        serie = serie.astype(object)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    traducidos = [quitar_tildes(valor) for valor in unicos]
+    if traducidos == list(unicos):
+        return serie
+    # El código -1 (valores nulos) toma el último elemento, que es NaN
+    traducidos = np.array(traducidos + [np.nan], dtype=object)
+    return pd.Series(traducidos.take(codigos), index=serie.index, name=serie.name)
+
+def normalizar_texto(df):
+    """Normaliza nombres de columnas y solo las columnas de texto del DataFrame."""
+    df = df.copy()
+    df.columns = [quitar_tildes(col) for col in df.columns]
+    for col in df.select_dtypes(include=['object', 'string', 'category']).columns:
+        df[col] = normalizar_columna(df[col])
+    return df
+
+def normalizar_nombre(columna):
+    """Nombre de columna en minúsculas, con '_' en lugar de espacios (sin quitar tildes)."""
+    return columna.lower().replace(' ', '_')
+
+def leer_csv(ruta, columnas=None):
+    """Lee un CSV del DANE separado por ';' con columnas y textos normalizados."""
+    df = pd.read_csv(ruta, sep=';')
+    df.columns = [normalizar_nombre(col) for col in df.columns]
+    if columnas is not None:
+        df = df[columnas]
+    return normalizar_texto(df)
+
+def leer_codigos(ruta):
+    return leer_csv(ruta, ['capítulo', 'nombre_capítulo', 'código_de_la_cie-10_tres_caracteres',
         'descripción__de_códigos_mortalidad_a_tres_caracteres',
         'código_de_la_cie-10_cuatro_caracteres',
-        'descripcion__de_códigos_mortalidad_a_cuatro_caracteres']]
-    muerte.columns = [quitar_tildes(col) for col in muerte.columns]
-    muerte = muerte.map(quitar_tildes)
-    cod.columns = [quitar_tildes(col) for col in cod.columns]
-    cod = cod.map(quitar_tildes)
-    pola.columns = [quitar_tildes(col) for col in pola.columns]
-    pola = pola.map(quitar_tildes)
+        'descripcion__de_códigos_mortalidad_a_cuatro_caracteres'])
+
+# Archivo fuente y función de lectura de cada base
+ARCHIVOS = {
+    'muerte': ("NoFetal2019.csv", leer_csv),
+    'cod': ("CodigosDeMuerte.csv", leer_codigos),
+    'pola': ("Divipola.csv", leer_csv),
+}
+
+@metricas.instrumentar()
+def cargar_archivo(nombre, directorio="info", usar_cache=True):
+    """Carga una base normalizada, usando la caché columnar si está vigente."""
+    archivo, leer = ARCHIVOS[nombre]
+    return cache.leer_con_cache(os.path.join(directorio, archivo), leer, usar_cache)
+
+def cargar_archivos(usar_cache=True, directorio="info"):
+    """Carga las tres bases normalizadas, usando la caché columnar si está vigente."""
+    muerte = cargar_archivo('muerte', directorio, usar_cache)
+    cod = cargar_archivo('cod', directorio, usar_cache)
+    pola = cargar_archivo('pola', directorio, usar_cache)
     return muerte, cod, pola
 
-def data_mapa():
-    Mapa=muerte[muerte['ano']==2019]
-    dp=pola[['cod_departamento','departamento']].drop_duplicates()
-    Mapa= pd.merge(Mapa,dp, on='cod_departamento', how='inner')
-    Mapa=pd.DataFrame(Mapa['departamento'].value_counts()).reset_index()
-    Mapa['anio']=2019
-    Mapa=Mapa.rename(columns={'count':'cantidad_muertes'})
-    Mapa['departamento'] = Mapa['departamento'].str.title()
-    Mapa['departamento']=Mapa['departamento'].str.replace(',','')
-    return Mapa
+### Dimensiones indexadas (DIVIPOLA y CIE-10)
+
+# Reporte de filas (y memoria, si se midió) de las últimas uniones, en el orden en que se
+# hicieron; acotado porque el tablero hace uniones en cada consulta que no está en caché
+reporte_uniones = collections.deque(maxlen=100)
+
+def validar_clave_unica(dim, nombre):
+    """Falla si la dimensión tiene claves repetidas (la unión multiplicaría filas)."""
+    repetidas = dim.index[dim.index.duplicated()].unique()
+    if len(repetidas):
+        raise ValueError(
+            f"La dimensión {nombre} tiene {len(repetidas)} claves repetidas, por ejemplo: "
+            f"{list(repetidas[:5])}")
+    return dim
+
+@metricas.instrumentar()
+def construir_dimensiones(cod, pola):
+    """Construye una sola vez las tablas de dimensiones indexadas por su clave."""
+    municipios = (
+        pola[['cod_departamento', 'cod_municipio', 'municipio', 'departamento']]
+        .drop_duplicates()
+        .set_index(['cod_departamento', 'cod_municipio']))
+    departamentos = (
+        pola[['cod_departamento', 'departamento']]
+        .drop_duplicates()
+        .set_index('cod_departamento'))
+    # CodigosDeMuerte trae una fila por código de 4 caracteres; se deja una por código de 3
+    causas = (
+        cod[['codigo_de_la_cie-10_tres_caracteres',
+             'descripcion__de_codigos_mortalidad_a_tres_caracteres']]
+        .drop_duplicates()
+        .set_index('codigo_de_la_cie-10_tres_caracteres'))
+    # Códigos de 4 caracteres con su código de 3, para bajar de nivel en la tabla de causas
+    causas_detalle = (
+        cod[['codigo_de_la_cie-10_cuatro_caracteres',
+             'descripcion__de_codigos_mortalidad_a_cuatro_caracteres',
+             'codigo_de_la_cie-10_tres_caracteres']]
+        .drop_duplicates()
+        .set_index('codigo_de_la_cie-10_cuatro_caracteres'))
+    return {
+        'municipios': validar_clave_unica(municipios, 'municipios (DIVIPOLA)'),
+        'departamentos': validar_clave_unica(departamentos, 'departamentos (DIVIPOLA)'),
+        'causas': validar_clave_unica(causas, 'causas (CIE-10)'),
+        'causas_detalle': validar_clave_unica(causas_detalle, 'causas de 4 caracteres (CIE-10)'),
+    }
+
+def _tomar(valores, posiciones):
+    # La posición -1 (clave sin coincidencia) toma el último elemento, que es NaN
+    valores = np.append(np.asarray(valores, dtype=object), np.nan)
+    return valores.take(posiciones)
+
+def _tomar_categorica(valores, posiciones):
+    # Cada valor distinto de la dimensión se guarda una sola vez; las filas llevan su código
+    codigos, categorias = pd.factorize(np.asarray(valores, dtype=object))
+    return pd.Categorical.from_codes(np.append(codigos, -1).take(posiciones), categories=categorias)
+
+@metricas.instrumentar()
+def unir_dimension(df, dim, claves, nombre, categorica=False, medir_memoria=False):
+    """Agrega las columnas de `dim` a `df` buscando `claves` en su índice.
+
+    Equivale a un merge left, pero con una búsqueda por índice: devuelve
+    exactamente una fila por cada fila de `df`. Con categorica=True las
+    columnas agregadas son categóricas en lugar de texto repetido por fila.
+    medir_memoria recorre los textos del resultado para reportar su memoria;
+    solo vale la pena en las uniones de preparar_datos, que se hacen una vez.
+    """
+    if len(claves) == 1:
+        llave = pd.Index(df[claves[0]])
+    else:
+        llave = pd.MultiIndex.from_frame(df[claves])
+    posiciones = dim.index.get_indexer(llave)
+    tomar = _tomar_categorica if categorica else _tomar
+    resultado = df.assign(**{col: tomar(dim[col], posiciones) for col in dim.columns})
+    reporte = {
+        'union': nombre,
+        'filas_entrada': len(df),
+        'filas_salida': len(resultado),
+        'sin_coincidencia': int((posiciones == -1).sum()),
+    }
+    reporte_uniones.append(reporte)
+    if medir_memoria:
+        reporte['memoria_mb'] = round(float(resultado.memory_usage(deep=True).sum()) / 1e6, 1)
+        logger.info("union %(union)s: %(filas_entrada)d -> %(filas_salida)d filas, "
+                    "%(sin_coincidencia)d sin coincidencia, %(memoria_mb)s MB", reporte)
+    else:
+        logger.debug("union %(union)s: %(filas_entrada)d -> %(filas_salida)d filas, "
+                     "%(sin_coincidencia)d sin coincidencia", reporte)
+    return resultado
 
 ### Preparar copias de trabajo y unir bases
 
-def preparar_datos(muerte, cod, pola):
-    """Crea copias de las bases y las une con los códigos y municipios."""
-    muerte_proc = muerte.copy()
-    cod_proc = cod.copy()
-    pola_proc = pola.copy()
-
-    # --- Unir las bases (codigos y divipola) ---
-    muerte_proc = muerte_proc.merge(
-    cod_proc[['codigo_de_la_cie-10_tres_caracteres',
-              'descripcion__de_codigos_mortalidad_a_tres_caracteres']],
-    left_on='cod_muerte',
-    right_on='codigo_de_la_cie-10_tres_caracteres',
-    how='left')
-    
-    muerte_proc = muerte_proc.merge(
-    pola_proc[['cod_municipio', 'municipio', 'departamento', 'cod_departamento']],
-    on='cod_municipio',
-    how='left')
+@metricas.instrumentar()
+def preparar_datos(muerte, cod, pola, dimensiones=None, compacto=False):
+    """Une las muertes con los códigos CIE-10 y los municipios DIVIPOLA.
+
+    Con compacto=True el resultado pasa por compactar(): los textos de las
+    dimensiones se unen ya como categóricas y el resto de columnas se reduce.
+    """
+    if dimensiones is None:
+        dimensiones = construir_dimensiones(cod, pola)
+    muerte_proc = unir_dimension(muerte, dimensiones['causas'], ['cod_muerte'], 'causas', compacto,
+                                 medir_memoria=True)
+    muerte_proc = unir_dimension(
+        muerte_proc, dimensiones['municipios'], ['cod_departamento', 'cod_municipio'], 'municipios', compacto,
+        medir_memoria=True)
+    if compacto:
+        muerte_proc = compactar(muerte_proc)
     return muerte_proc
 
+### Representación compacta de muerte_proc
+
+def _entero_minimo(serie):
+    """La serie con el tipo entero más pequeño que admite sus valores (Int* si tiene nulos)."""
+    valores = serie.dropna()
+    if pd.api.types.is_float_dtype(serie.dtype) and not (valores == np.floor(valores)).all():
+        return serie
+    minimo, maximo = (valores.min(), valores.max()) if len(valores) else (0, 0)
+    for tipo in (np.int8, np.int16, np.int32, np.int64):
+        limites = np.iinfo(tipo)
+        if limites.min <= minimo and maximo <= limites.max:
+            break
+    if serie.isna().any():
+        return serie.astype(f"Int{np.iinfo(tipo).bits}")
+    return serie.astype(tipo)
+
+def compactar(df):
+    """Textos como categóricas y enteros en el tipo más pequeño.
+
+    Los valores no cambian; los groupby sobre las columnas compactas
+    trabajan con códigos enteros en lugar de comparar textos. Las uniones
+    por índice (unir_dimension) no dejan claves repetidas que quitar.
+    """
+    columnas = {}
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object or isinstance(serie.dtype, pd.StringDtype):
+            codigos, categorias = pd.factorize(serie, use_na_sentinel=True)
+            columnas[col] = pd.Categorical.from_codes(codigos, categories=categorias)
+        elif pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+            columnas[col] = _entero_minimo(serie)
+        else:
+            columnas[col] = serie
+    compacto = pd.DataFrame(columnas, index=df.index)
+    logger.info("compactar: %.1f MB -> %.1f MB",
+                df.memory_usage(deep=True).sum() / 1e6, compacto.memory_usage(deep=True).sum() / 1e6)
+    return compacto
+
+def reporte_memoria(antes, despues):
+    """Memoria (MB, contando el texto) y tipo de cada columna antes y después de compactar."""
+    mb_antes = antes.memory_usage(deep=True, index=False) / 1e6
+    mb_despues = despues.memory_usage(deep=True, index=False).reindex(mb_antes.index) / 1e6
+    reporte = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'tipo_despues': despues.dtypes.astype(str).reindex(mb_antes.index).fillna('(eliminada)'),
+        'mb_antes': mb_antes.round(2),
+        'mb_despues': mb_despues.fillna(0).round(2),
+    })
+    reporte.loc['total'] = ['', '', round(mb_antes.sum(), 2), round(mb_despues.sum(), 2)]
+    reporte['reduccion'] = (reporte['mb_antes'] / reporte['mb_despues'].where(reporte['mb_despues'] > 0)).round(1)
+    return reporte
+
+### Cubo de conteos: una sola pasada sobre los registros de defunción
+
+DIMENSIONES_CUBO = ['ano', 'cod_departamento', 'cod_municipio', 'sexo', 'mes', 'grupo_edad1', 'cod_muerte']
+
+@metricas.instrumentar()
+def construir_cubo(muerte):
+    """Cuenta las muertes por cada combinación de DIMENSIONES_CUBO.
+
+    Es la única pasada completa sobre los registros: todas las gráficas se
+    calculan después como proyecciones de este cubo. Se guardan el código
+    GRUPO_EDAD1 y la causa completa (3 o 4 caracteres) en lugar de la
+    categoría de edad y la CIE-10 a 3 caracteres, porque la tabla de causas
+    baja al detalle de 4 caracteres, el índice de prefijos los busca y las
+    entregas del DANE (ingesta.py) y la base SQLite usan esos códigos. Con
+    años, municipios y meses como claves el cubo no es mucho menor que los
+    registros de un año; lo que se ahorra es releer y unir las bases por
+    cada gráfica.
+    """
+    return (
+        muerte.groupby(DIMENSIONES_CUBO, dropna=False, sort=False, observed=True)
+        .size()
+        .reset_index(name='total'))
+
+def proyectar(cubo, columnas):
+    """Suma el cubo sobre las columnas pedidas."""
+    return cubo.groupby(columnas, dropna=False, sort=False, observed=True)['total'].sum().reset_index()
+
+def combinar_cubos(cubos):
+    """Suma cubos parciales celda a celda (la operación es asociativa)."""
+    juntos = pd.concat(cubos, ignore_index=True)
+    if isinstance(juntos['cod_muerte'].dtype, pd.CategoricalDtype):
+        juntos['cod_muerte'] = juntos['cod_muerte'].astype(object)
+    return proyectar(juntos, DIMENSIONES_CUBO)
+
+### Lectura por bloques de NoFetal: memoria de los registros acotada por el tamaño del bloque
+
+# Tipos explícitos de las únicas columnas que necesita el cubo
+ESQUEMA_NOFETAL = {
+    'ano': 'Int16',
+    'cod_departamento': 'Int8',
+    'cod_municipio': 'Int32',
+    'sexo': 'Int8',
+    'mes': 'Int8',
+    'grupo_edad1': 'Int8',
+    'cod_muerte': 'category',
+}
+
+def leer_por_bloques(ruta, tamano_bloque=500_000, esquema=ESQUEMA_NOFETAL):
+    """Itera sobre el CSV en bloques normalizados, leyendo solo las columnas del esquema."""
+    encabezado = pd.read_csv(ruta, sep=';', nrows=0).columns
+    # El esquema usa los nombres normalizados; read_csv necesita los originales
+    originales = {col: quitar_tildes(normalizar_nombre(col)) for col in encabezado}
+    faltantes = set(esquema) - set(originales.values())
+    if faltantes:
+        raise KeyError(f"{ruta} no contiene las columnas {sorted(faltantes)}")
+    tipos = {col: esquema[nombre] for col, nombre in originales.items() if nombre in esquema}
+    for bloque in pd.read_csv(ruta, sep=';', usecols=list(tipos), dtype=tipos, chunksize=tamano_bloque):
+        bloque.columns = [originales[col] for col in bloque.columns]
+        yield normalizar_texto(bloque)
+
+@metricas.instrumentar()
+def construir_cubo_por_bloques(ruta, tamano_bloque=500_000):
+    """Construye el mismo cubo que construir_cubo sin cargar el archivo completo.
+
+    Cada bloque se reduce a un cubo parcial. Los parciales se suman de a
+    pares de igual tamaño, como en un merge sort, así que cada celda se
+    reagrupa unas log2(bloques) veces en lugar de una vez por bloque. La
+    memoria de los registros depende del tamaño del bloque, pero la del cubo
+    no: con las claves de DIMENSIONES_CUBO hay casi una celda por registro,
+    así que el total es O(celdas), del orden de los registros del archivo
+    (en filas de ocho columnas pequeñas en lugar de las de NoFetal).
+    """
+    # Pila de (nivel, cubo): un cubo de nivel n resume 2**n bloques
+    pila = []
+    for bloque in leer_por_bloques(ruta, tamano_bloque):
+        nivel, parcial = 0, construir_cubo(bloque)
+        while pila and pila[-1][0] == nivel:
+            parcial = combinar_cubos([pila.pop()[1], parcial])
+            nivel += 1
+        pila.append((nivel, parcial))
+    if not pila:
+        return construir_cubo(pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in ESQUEMA_NOFETAL.items()}))
+    return combinar_cubos([parcial for _, parcial in pila])
+
+### Varios años en paralelo: un cubo parcial por archivo NoFetal<año>.csv
+
+def archivos_nofetal(directorio="info"):
+    """Rutas de los archivos anuales NoFetal<año>.csv del directorio, por año."""
+    rutas = {}
+    for ruta in glob.glob(os.path.join(directorio, "NoFetal*.csv")):
+        ano = os.path.basename(ruta)[len("NoFetal"):-len(".csv")]
+        if ano.isdigit():
+            rutas[int(ano)] = ruta
+    return dict(sorted(rutas.items()))
+
+@metricas.instrumentar()
+def construir_cubo_multianual(rutas, tamano_bloque=500_000, trabajadores=None):
+    """Construye el cubo de varios archivos, cada uno en un proceso distinto.
+
+    Cada proceso devuelve el cubo parcial de su archivo y los parciales se
+    suman con combinar_cubos, así que el resultado no depende del orden.
+    """
+    rutas = list(rutas)
+    if not rutas:
+        raise FileNotFoundError("No hay archivos NoFetal<año>.csv para el cubo multianual")
+    if len(rutas) == 1 or trabajadores == 1:
+        parciales = [construir_cubo_por_bloques(ruta, tamano_bloque) for ruta in rutas]
+    else:
+        with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+            parciales = list(ejecutor.map(
+                construir_cubo_por_bloques, rutas, itertools.repeat(tamano_bloque)))
+    return combinar_cubos(parciales)
+
+# Funciones de agregación del tablero, por nombre
+AGREGADOS = {}
+
+def agregado(funcion):
+    """Registra una agregación del cubo.
+
+    Llamada sin argumentos usa el proceso predeterminado y su resultado
+    memoizado; con (cubo, dimensiones) calcula directamente.
+    """
+    AGREGADOS[funcion.__name__] = metricas.instrumentar()(funcion)
+
+    @functools.wraps(funcion)
+    def envoltura(cubo=None, dimensiones=None):
+        if cubo is None:
+            return obtener_proceso().agregado(funcion.__name__)
+        return AGREGADOS[funcion.__name__](cubo, dimensiones)
+    return envoltura
+
+def proyectar_municipios(cubo, dimensiones):
+    por_municipio = proyectar(cubo, ['cod_departamento', 'cod_municipio'])
+    return unir_dimension(
+        por_municipio, dimensiones['municipios'], ['cod_departamento', 'cod_municipio'], 'municipios')
+
+### Índice de causas CIE-10: filas del cubo por prefijo de código sin recorrerlo completo
+
+# Rango de códigos de 3 caracteres y nombre corto de cada capítulo de la CIE-10
+CAPITULOS_CIE10 = {
+    '01': ('A00', 'B99', 'Infecciosas y parasitarias'),
+    '02': ('C00', 'D48', 'Tumores'),
+    '03': ('D50', 'D89', 'Sangre e inmunidad'),
+    '04': ('E00', 'E90', 'Endocrinas, nutricionales y metabólicas'),
+    '05': ('F00', 'F99', 'Trastornos mentales'),
+    '06': ('G00', 'G99', 'Sistema nervioso'),
+    '07': ('H00', 'H59', 'Ojo'),
+    '08': ('H60', 'H95', 'Oído'),
+    '09': ('I00', 'I99', 'Sistema circulatorio'),
+    '10': ('J00', 'J99', 'Sistema respiratorio'),
+    '11': ('K00', 'K93', 'Sistema digestivo'),
+    '12': ('L00', 'L99', 'Piel'),
+    '13': ('M00', 'M99', 'Sistema osteomuscular'),
+    '14': ('N00', 'N99', 'Sistema genitourinario'),
+    '15': ('O00', 'O99', 'Embarazo, parto y puerperio'),
+    '16': ('P00', 'P96', 'Período perinatal'),
+    '17': ('Q00', 'Q99', 'Malformaciones congénitas'),
+    '18': ('R00', 'R99', 'Síntomas y hallazgos anormales'),
+    '19': ('S00', 'T98', 'Traumatismos y envenenamientos'),
+    '20': ('V01', 'Y98', 'Causas externas'),
+    '21': ('Z00', 'Z99', 'Factores que influyen en la salud'),
+    '22': ('U00', 'U99', 'Códigos para propósitos especiales'),
+}
+
+class IndiceCausas:
+    """Posiciones de las filas del cubo ordenadas por cod_muerte.
+
+    Las filas de un mismo prefijo (X95, X9, los códigos de un capítulo...)
+    quedan contiguas: cada consulta son dos búsquedas binarias sobre los
+    códigos distintos y un corte, en tiempo proporcional a las coincidencias.
+    """
+
+    def __init__(self, cubo):
+        codigos, unicos = pd.factorize(cubo['cod_muerte'], use_na_sentinel=True)
+        unicos = np.asarray(unicos, dtype=object).astype(str)
+        orden_unicos = np.argsort(unicos, kind='stable')
+        self.codigos = unicos[orden_unicos]
+        rango = np.empty(len(unicos), dtype=np.int64)
+        rango[orden_unicos] = np.arange(len(unicos))
+        # Las filas sin código van al final y ninguna consulta las alcanza
+        rango_filas = np.where(codigos >= 0, rango.take(np.maximum(codigos, 0)), len(unicos))
+        self.orden = np.argsort(rango_filas, kind='stable')
+        self.inicios = np.searchsorted(rango_filas[self.orden], np.arange(len(unicos) + 1))
+
+    def posiciones_rango(self, desde, hasta):
+        """Posiciones de las filas cuyo código está entre los prefijos `desde` y `hasta` (incluidos)."""
+        inicio = np.searchsorted(self.codigos, desde, side='left')
+        fin = np.searchsorted(self.codigos, hasta + '\uffff', side='right')
+        return self.orden[self.inicios[inicio]:self.inicios[fin]]
+
+    def posiciones(self, prefijo):
+        """Posiciones de las filas cuyo código empieza por `prefijo`."""
+        return self.posiciones_rango(prefijo, prefijo)
+
+    def posiciones_capitulo(self, capitulo):
+        desde, hasta, _ = CAPITULOS_CIE10[capitulo]
+        return self.posiciones_rango(desde, hasta)
+
+# Índice de cada cubo vivo, para no reconstruirlo en cada consulta sobre el mismo cubo
+_indices_causas = {}
+
+def indice_causas(cubo):
+    """IndiceCausas del cubo, construido en la primera consulta y guardado mientras el cubo exista."""
+    clave = id(cubo)
+    entrada = _indices_causas.get(clave)
+    if entrada is not None and entrada[0]() is cubo:
+        return entrada[1]
+    indice = IndiceCausas(cubo)
+    _indices_causas[clave] = (weakref.ref(cubo, lambda _, clave=clave: _indices_causas.pop(clave, None)), indice)
+    return indice
+
+def posiciones_extremas(valores, k, mayores=True):
+    """Posiciones de los k valores mayores (o menores), en el orden de un sort estable.
+
+    En lugar de ordenar todos los valores, np.partition halla el k-ésimo y
+    solo se ordenan los candidatos que lo alcanzan (k más los empates).
+    """
+    clave = -np.asarray(valores) if mayores else np.asarray(valores)
+    if k >= len(clave):
+        return np.argsort(clave, kind='stable')[:k]
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    umbral = np.partition(clave, k - 1)[k - 1]
+    candidatos = np.flatnonzero(clave <= umbral)
+    return candidatos[np.argsort(clave[candidatos], kind='stable')][:k]
+
+def ranking_municipios(cubo, dimensiones, prefijo=None, capitulo=None, k=5, mayores=True, mascara=None):
+    """Los k municipios con más (o menos) muertes, opcionalmente solo por un prefijo CIE-10 o un capítulo.
+
+    Devuelve las columnas municipio y total. Las filas de la causa salen del
+    índice del cubo y `mascara` (ver mascara_cubo) aplica los filtros del
+    tablero sin construir un cubo filtrado.
+    """
+    if prefijo or capitulo:
+        indice = indice_causas(cubo)
+        posiciones = indice.posiciones_capitulo(capitulo) if capitulo else indice.posiciones(prefijo)
+        if mascara is not None:
+            posiciones = posiciones[mascara[posiciones]]
+        seleccion = cubo.iloc[np.sort(posiciones)]
+    else:
+        seleccion = cubo if mascara is None else cubo[mascara]
+    por_municipio = proyectar_municipios(seleccion, dimensiones).groupby('municipio')['total'].sum()
+    return por_municipio.iloc[posiciones_extremas(por_municipio.to_numpy(), k, mayores)].reset_index()
+
+@agregado
+def data_mapa(cubo=None, dimensiones=None):
+    Mapa=unir_dimension(
+        proyectar(cubo, ['ano', 'cod_departamento']), dimensiones['departamentos'], ['cod_departamento'], 'departamentos')
+    Mapa=(
+        Mapa.groupby(['ano', 'departamento'])['total'].sum().reset_index()
+        .sort_values(['ano', 'total'], ascending=[True, False], kind='stable')
+        .reset_index(drop=True))
+    Mapa=Mapa.rename(columns={'total':'cantidad_muertes', 'ano':'anio'})
+    Mapa=Mapa[['departamento', 'cantidad_muertes', 'anio']]
+    Mapa['departamento'] = Mapa['departamento'].str.title()
+    Mapa['departamento']=Mapa['departamento'].str.replace(',','')
+    return Mapa
+
 ### Visualización de las 5 ciudades más violentas de Colombia, considerando homicidios 
 ### (códigos X95, agresión con disparo de armas de fuego y casos no especificados).
 
-def grafico_barras():
+@agregado
+def grafico_barras(cubo=None, dimensiones=None):
     """Devuelve las 5 ciudades con más homicidios (X95)."""
-    violencia = muerte_proc[muerte_proc['cod_muerte'].str.startswith('X95', na=False)]
-
-    violencia_ciudad = (
-        violencia.groupby('municipio')
-        .size()
-        .reset_index(name='total_homicidios')
-        .sort_values('total_homicidios', ascending=False)
-    )
-
-    top5 = violencia_ciudad.head(5)
+    top5 = (
+        ranking_municipios(cubo, dimensiones, prefijo='X95', k=5)
+        .rename(columns={'total': 'total_homicidios'}))
     #print(" Ciudades más violentas (códigos X95):")
     #print(top5)
     return top5
 
 # Muestra las 10 ciudades con menor índice de mortalidad.
 
-def grafico_circular():
+@agregado
+def grafico_circular(cubo=None, dimensiones=None):
     """Devuelve las 10 ciudades con menor cantidad total de muertes."""
-    mortalidad_ciudad = (
-        muerte_proc.groupby('municipio')
-        .size()
-        .reset_index(name='total_muertes')
-        .sort_values('total_muertes', ascending=True)
-    )
-
-    ciudadesmenor = mortalidad_ciudad.head(10)
+    ciudadesmenor = (
+        ranking_municipios(cubo, dimensiones, k=10, mayores=False)
+        .rename(columns={'total': 'total_muertes'}))
     #print("\n Ciudades con menor mortalidad:")
     #print(ciudadesmenor)
     return ciudadesmenor
 
 ###  Listado de las 10 principales causas de muerte en Colombia, 
 # incluyendo su código, nombre y total de casos (ordenadas de mayor a menor).
-def tabla():
-    muerte_proc = muerte.copy()
-    cod_proc = cod.copy()
-    pola_proc = pola.copy()
-
-    # Unir códigos de muerte para obtener descripción
-    muerte_proc = muerte_proc.merge(
-        cod_proc[['codigo_de_la_cie-10_tres_caracteres',
-                'descripcion__de_codigos_mortalidad_a_tres_caracteres']],
-        left_on='cod_muerte',
-        right_on='codigo_de_la_cie-10_tres_caracteres',
-        how='left')
-
-    # Agrupar por código y descripción, contar casos
+@agregado
+def tabla(cubo=None, dimensiones=None):
+    # Los registros traen el código de 4 caracteres (o el de 3 si la categoría no se
+    # subdivide): cada uno suma en su categoría de 3, que es la clave de la dimensión
+    por_codigo = proyectar(cubo, ['cod_muerte'])
+    por_codigo['cod_muerte'] = por_codigo['cod_muerte'].astype(object).str[:3]
+    por_causa = unir_dimension(
+        proyectar(por_codigo, ['cod_muerte']), dimensiones['causas'], ['cod_muerte'], 'causas')
+
+    # Agrupar por código y descripción, sumar casos
     top10_causas = (
-        muerte_proc.groupby(['cod_muerte', 'descripcion__de_codigos_mortalidad_a_tres_caracteres'])
-        .size()
+        por_causa.groupby(['cod_muerte', 'descripcion__de_codigos_mortalidad_a_tres_caracteres'])['total']
+        .sum()
         .reset_index(name='total_casos')
-        .sort_values('total_casos', ascending=False)
+        .sort_values('total_casos', ascending=False, kind='stable')
         .head(10))
     #print(" 10 principales causas de muerte en Colombia:")
     #print(top10_causas)
@@ -133,19 +554,16 @@ def tabla():
 ### Comparación del total de muertes por sexo en cada departamento, 
 # para analizar diferencias significativas entre géneros.
 
-def grafico_apiladas():
-    pola_proc = pola.copy()
-
-    muerte_sexo = muerte.merge(
-        pola_proc[['cod_departamento', 'departamento']],
-        on='cod_departamento',
-        how='left'
-    )
+@agregado
+def grafico_apiladas(cubo=None, dimensiones=None):
+    muerte_sexo = unir_dimension(
+        proyectar(cubo, ['cod_departamento', 'sexo']),
+        dimensiones['departamentos'], ['cod_departamento'], 'departamentos')
 
     # Agrupar por departamento y sexo
     muertes_por_sexo = (
-        muerte_sexo.groupby(['departamento', 'sexo'])
-        .size()
+        muerte_sexo.groupby(['departamento', 'sexo'])['total']
+        .sum()
         .reset_index(name='total_muertes')
     )
 
@@ -153,62 +571,69 @@ def grafico_apiladas():
     #print(muertes_por_sexo.head(10))
     return muertes_por_sexo
  
-def histograma():
+### Categorías de edad según los códigos DANE de GRUPO_EDAD1
+
+RANGOS_EDAD = {
+    "Mortalidad neonatal": {"codigos": range(0, 5), "rango": "Menor de 1 mes"},
+    "Mortalidad infantil": {"codigos": range(5, 7), "rango": "1 a 11 meses"},
+    "Primera infancia": {"codigos": range(7, 9), "rango": "1 a 4 años"},
+    "Niñez": {"codigos": range(9, 11), "rango": "5 a 14 años"},
+    "Adolescencia": {"codigos": [11], "rango": "15 a 19 años"},
+    "Juventud": {"codigos": range(12, 14), "rango": "20 a 29 años"},
+    "Adultez temprana": {"codigos": range(14, 17), "rango": "30 a 44 años"},
+    "Adultez intermedia": {"codigos": range(17, 20), "rango": "45 a 59 años"},
+    "Vejez": {"codigos": range(20, 25), "rango": "60 a 84 años"},
+    "Longevidad / Centenarios": {"codigos": range(25, 29), "rango": "85 a 100+ años"},
+    "Edad desconocida": {"codigos": [29], "rango": "Sin información"}
+}
+CATEGORIAS_EDAD = list(RANGOS_EDAD)
+RANGOS_EDAD_ORDEN = [info["rango"] for info in RANGOS_EDAD.values()]
+_EDAD_DESCONOCIDA = CATEGORIAS_EDAD.index("Edad desconocida")
+
+# Posición de la categoría para cada código 0..29, compilada una sola vez
+_CATEGORIA_POR_CODIGO = np.full(max(max(i["codigos"]) for i in RANGOS_EDAD.values()) + 1, _EDAD_DESCONOCIDA)
+for _posicion, _info in enumerate(RANGOS_EDAD.values()):
+    _CATEGORIA_POR_CODIGO[list(_info["codigos"])] = _posicion
+
+def clasificar_edad(grupo_edad1):
+    """Categoría ordenada de edad para cada código; los códigos inválidos van a "Edad desconocida"."""
+    codigos = pd.to_numeric(pd.Series(grupo_edad1), errors='coerce').to_numpy(dtype=float)
+    validos = np.isfinite(codigos) & (codigos >= 0) & (codigos < len(_CATEGORIA_POR_CODIGO))
+    validos &= np.floor(np.where(validos, codigos, 0)) == codigos
+    posiciones = np.full(len(codigos), _EDAD_DESCONOCIDA)
+    posiciones[validos] = _CATEGORIA_POR_CODIGO.take(codigos[validos].astype(np.int64))
+    return pd.Categorical.from_codes(posiciones, categories=CATEGORIAS_EDAD, ordered=True)
+
+@agregado
+def histograma(cubo=None, dimensiones=None):
     """Agrupa las muertes por categorías de edad según los códigos DANE y muestra su rango descriptivo."""
-    muerte_proc = muerte.copy()
-
-    # --- Diccionario con los rangos DANE y descripciones ---
-    rangos_edad = {
-        "Mortalidad neonatal": {"codigos": range(0, 5), "rango": "Menor de 1 mes"},
-        "Mortalidad infantil": {"codigos": range(5, 7), "rango": "1 a 11 meses"},
-        "Primera infancia": {"codigos": range(7, 9), "rango": "1 a 4 años"},
-        "Niñez": {"codigos": range(9, 11), "rango": "5 a 14 años"},
-        "Adolescencia": {"codigos": [11], "rango": "15 a 19 años"},
-        "Juventud": {"codigos": range(12, 14), "rango": "20 a 29 años"},
-        "Adultez temprana": {"codigos": range(14, 17), "rango": "30 a 44 años"},
-        "Adultez intermedia": {"codigos": range(17, 20), "rango": "45 a 59 años"},
-        "Vejez": {"codigos": range(20, 25), "rango": "60 a 84 años"},
-        "Longevidad / Centenarios": {"codigos": range(25, 29), "rango": "85 a 100+ años"},
-        "Edad desconocida": {"codigos": [29], "rango": "Sin información"}
-    }
+    por_edad = proyectar(cubo, ['grupo_edad1'])
+    por_edad["categoria_edad"] = clasificar_edad(por_edad["grupo_edad1"])
 
-    # --- Función auxiliar para clasificar cada código ---
-    def clasificar_grupo(cod):
-        try:
-            codigo = int(cod)
-        except (ValueError, TypeError):
-            return "Edad desconocida"
-        for categoria, info in rangos_edad.items():
-            if codigo in info["codigos"]:
-                return categoria
-        return "Edad desconocida"
-
-    # --- Aplicar clasificación ---
-    muerte_proc["categoria_edad"] = muerte_proc["grupo_edad1"].apply(clasificar_grupo)
-
-    # --- Agrupar por categoría ---
+    # --- Agrupar por categoría, en el orden del ciclo de vida ---
     dist_edad = (
-        muerte_proc.groupby("categoria_edad")
-        .size()
+        por_edad.groupby("categoria_edad", observed=True)["total"]
+        .sum()
         .reset_index(name="total_muertes")
-        .sort_values("total_muertes", ascending=False)
     )
 
     # --- Agregar el rango de edad descriptivo ---
-    dist_edad["rango_edad"] = dist_edad["categoria_edad"].map(lambda c: rangos_edad[c]["rango"])
+    dist_edad["rango_edad"] = pd.Categorical.from_codes(
+        dist_edad["categoria_edad"].cat.codes, categories=RANGOS_EDAD_ORDEN, ordered=True)
 
     #print("\n Distribución de muertes por categoría y rango de edad:")
     #print(dist_edad[["categoria_edad", "rango_edad", "total_muertes"]])
     return dist_edad
 
-def grafico_lineal():
+@agregado
+def grafico_lineal(cubo=None, dimensiones=None):
     """Devuelve el total de muertes por mes en Colombia."""
-    if 'mes' not in muerte_proc.columns:
+    if 'mes' not in cubo.columns:
         raise KeyError("El DataFrame no contiene la columna 'mes'.")
 
     muertes_mes = (
-        muerte_proc.groupby('mes')
-        .size()
+        proyectar(cubo, ['mes']).groupby('mes')['total']
+        .sum()
         .reset_index(name='total_muertes')
         .sort_values('mes')    )
 
@@ -217,6 +642,179 @@ def grafico_lineal():
     return muertes_mes
  
 
-global muerte, cod, pola, muerte_proc
-muerte, cod, pola =cargar_archivos()
-muerte_proc = preparar_datos(muerte, cod, pola)
\ No newline at end of file
+### Cubo en disco para el tablero
+
+# Columnas índice de cada dimensión al guardarlas como tablas planas
+CLAVES_DIMENSIONES = {
+    'municipios': ['cod_departamento', 'cod_municipio'],
+    'departamentos': ['cod_departamento'],
+    'causas': ['codigo_de_la_cie-10_tres_caracteres'],
+    'causas_detalle': ['codigo_de_la_cie-10_cuatro_caracteres'],
+}
+
+def guardar_cubo(directorio="info/cubo", cubo=None, dimensiones=None):
+    """Guarda el cubo y las dimensiones para que app.py los use sin las bases crudas."""
+    if cubo is None:
+        cubo = obtener_proceso().cubo
+    if dimensiones is None:
+        dimensiones = obtener_proceso().dimensiones
+    guardar_conteos(directorio, cubo)
+    guardar_dimensiones(directorio, dimensiones)
+
+def guardar_conteos(directorio, cubo):
+    cache.guardar_marco(cubo, os.path.join(directorio, 'cubo'))
+
+def guardar_dimensiones(directorio, dimensiones):
+    for nombre, dim in dimensiones.items():
+        cache.guardar_marco(dim.reset_index(), os.path.join(directorio, nombre))
+
+def cargar_cubo(directorio="info/cubo"):
+    """Devuelve (cubo, dimensiones) guardados con guardar_cubo."""
+    cubo = cache.cargar_marco(os.path.join(directorio, 'cubo'), mmap=False)
+    dimensiones = {}
+    for nombre, claves in CLAVES_DIMENSIONES.items():
+        meta = cache.leer_meta(os.path.join(directorio, nombre))
+        if meta is None and nombre == 'causas_detalle':
+            continue  # Cubos guardados antes de existir esta dimensión
+        dimensiones[nombre] = cache.cargar_marco(os.path.join(directorio, nombre), meta, mmap=False).set_index(claves)
+    return cubo, dimensiones
+
+def filtrar_cubo(cubo, departamentos=None, sexos=None, meses=None, edades=None, anios=None):
+    """Celdas del cubo que cumplen los filtros; un filtro vacío no filtra."""
+    return cubo[mascara_cubo(cubo, departamentos, sexos, meses, edades, anios)]
+
+def mascara_cubo(cubo, departamentos=None, sexos=None, meses=None, edades=None, anios=None):
+    """Máscara booleana de las celdas que cumplen los filtros de filtrar_cubo."""
+    mascara = np.ones(len(cubo), dtype=bool)
+    for columna, valores in [('cod_departamento', departamentos), ('sexo', sexos),
+                             ('mes', meses), ('ano', anios)]:
+        if valores:
+            mascara &= cubo[columna].isin(valores).to_numpy(dtype=bool, na_value=False)
+    if edades:
+        mascara &= np.isin(clasificar_edad(cubo['grupo_edad1']).astype(object), list(edades))
+    return mascara
+
+### Proceso perezoso: carga cada etapa al pedirla y la memoiza
+
+class ProcesoMortalidad:
+    """Bases, uniones, cubo y agregaciones, calculados solo cuando se piden.
+
+    Cada etapa se guarda tras calcularse; invalidar() descarta una etapa y
+    las que dependen de ella, sin tocar el resto.
+    """
+
+    # Etapas de las que depende cada etapa (las agregaciones se agregan abajo)
+    DEPENDENCIAS = {
+        'muerte': [],
+        'cod': [],
+        'pola': [],
+        'dimensiones': ['cod', 'pola'],
+        'muerte_proc': ['muerte', 'dimensiones'],
+        'cubo': ['muerte'],
+    }
+    DEPENDENCIAS.update({nombre: ['cubo', 'dimensiones'] for nombre in AGREGADOS})
+
+    def __init__(self, directorio="info", usar_cache=True, tamano_bloque=None,
+                 multianual=False, trabajadores=None, compacto=True):
+        # Con tamano_bloque el cubo se arma leyendo NoFetal por bloques, sin cargar `muerte`;
+        # con multianual se suman todos los NoFetal<año>.csv del directorio en paralelo;
+        # con compacto muerte (y el cubo que sale de ella) y muerte_proc usan categóricas
+        # y enteros pequeños (ver compactar)
+        self.directorio = directorio
+        self.compacto = compacto
+        self.usar_cache = usar_cache
+        self.tamano_bloque = tamano_bloque
+        self.multianual = multianual
+        self.trabajadores = trabajadores
+        self._memo = {}
+
+    def _obtener(self, nombre, construir):
+        if nombre not in self._memo:
+            self._memo[nombre] = construir()
+        return self._memo[nombre]
+
+    @property
+    def muerte(self):
+        # Compacta desde la carga: el cubo (y con él todos los agregados) agrupa sobre
+        # códigos enteros y la copia memoizada ocupa una fracción de la original
+        return self._obtener('muerte', lambda: self._compactar(
+            cargar_archivo('muerte', self.directorio, self.usar_cache)))
+
+    def _compactar(self, df):
+        return compactar(df) if self.compacto else df
+
+    @property
+    def cod(self):
+        return self._obtener('cod', lambda: cargar_archivo('cod', self.directorio, self.usar_cache))
+
+    @property
+    def pola(self):
+        return self._obtener('pola', lambda: cargar_archivo('pola', self.directorio, self.usar_cache))
+
+    @property
+    def dimensiones(self):
+        return self._obtener('dimensiones', lambda: construir_dimensiones(self.cod, self.pola))
+
+    @property
+    def muerte_proc(self):
+        return self._obtener(
+            'muerte_proc', lambda: preparar_datos(
+                self.muerte, self.cod, self.pola, self.dimensiones, self.compacto))
+
+    @property
+    def cubo(self):
+        if self.multianual:
+            rutas = archivos_nofetal(self.directorio).values()
+            return self._obtener('cubo', lambda: construir_cubo_multianual(
+                rutas, self.tamano_bloque or 500_000, self.trabajadores))
+        if self.tamano_bloque:
+            ruta = os.path.join(self.directorio, ARCHIVOS['muerte'][0])
+            return self._obtener('cubo', lambda: construir_cubo_por_bloques(ruta, self.tamano_bloque))
+        return self._obtener('cubo', lambda: construir_cubo(self.muerte))
+
+    def agregado(self, nombre):
+        """Resultado memoizado de una agregación (se devuelve una copia)."""
+        resultado = self._obtener(nombre, lambda: AGREGADOS[nombre](self.cubo, self.dimensiones))
+        return resultado.copy()
+
+    def calculadas(self):
+        return list(self._memo)
+
+    def fijar(self, **etapas):
+        """Reemplaza etapas por valores ya calculados (p. ej. el cubo con los deltas aplicados).
+
+        Lo que dependía de ellas se descarta, igual que con invalidar.
+        """
+        for nombre in etapas:
+            self.invalidar(nombre)
+        self._memo.update(etapas)
+
+    def invalidar(self, nombre=None):
+        """Descarta `nombre` y todo lo que depende de él; sin nombre descarta todo."""
+        if nombre is None:
+            self._memo.clear()
+            return
+        if nombre not in self.DEPENDENCIAS:
+            raise KeyError(f"Etapa desconocida: {nombre}")
+        pendientes = [nombre]
+        while pendientes:
+            actual = pendientes.pop()
+            self._memo.pop(actual, None)
+            pendientes.extend(
+                etapa for etapa, deps in self.DEPENDENCIAS.items() if actual in deps)
+
+
+_proceso = None
+
+def obtener_proceso():
+    """Proceso predeterminado del módulo, creado en el primer uso."""
+    global _proceso
+    if _proceso is None:
+        _proceso = ProcesoMortalidad()
+    return _proceso
+
+def __getattr__(nombre):
+    # Compatibilidad con process.muerte, process.muerte_proc, etc.
+    if nombre in ProcesoMortalidad.DEPENDENCIAS and nombre not in AGREGADOS:
+        return getattr(obtener_proceso(), nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
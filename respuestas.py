@@ -0,0 +1,77 @@
+"""Respuestas precalculadas y comprimidas para las rutas estáticas de Dash.
+
+Dash vuelve a convertir el layout a JSON en cada petición a _dash-layout (y
+la lista de callbacks en _dash-dependencies) y lo envía sin comprimir. Aquí
+se serializan una sola vez al arrancar, se guardan en crudo, en gzip y, si
+está instalado el paquete brotli, en br, y se sirven con un ETag fuerte para
+que las visitas repetidas reciban 304 Not Modified.
+"""
+import gzip
+import hashlib
+
+import flask
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él se sirve gzip
+    brotli = None
+
+RUTAS_PRECALCULADAS = ("_dash-layout", "_dash-dependencies")
+
+
+class RespuestaPrecalculada:
+    """Cuerpo de una respuesta en sus distintas codificaciones, con su ETag."""
+
+    def __init__(self, contenido, tipo="application/json"):
+        self.tipo = tipo
+        huella = hashlib.sha1(contenido).hexdigest()
+        # Un ETag fuerte distinto por codificación, como exige HTTP
+        self.codificaciones = {"identity": (contenido, huella)}
+        self.codificaciones["gzip"] = (gzip.compress(contenido, 9), f"{huella}-gz")
+        if brotli is not None:
+            self.codificaciones["br"] = (brotli.compress(contenido), f"{huella}-br")
+        self.etags = {etag for _, etag in self.codificaciones.values()}
+
+    def elegir_codificacion(self, peticion):
+        for codificacion in ("br", "gzip"):
+            if codificacion in self.codificaciones and peticion.accept_encodings[codificacion]:
+                return codificacion
+        return "identity"
+
+    def responder(self, peticion):
+        codificacion = self.elegir_codificacion(peticion)
+        cuerpo, etag = self.codificaciones[codificacion]
+        encabezados = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        # Cualquiera de las codificaciones vale: el contenido es el mismo
+        if any(peticion.if_none_match.contains(e) for e in self.etags):
+            return flask.Response(status=304, headers=encabezados)
+        if codificacion != "identity":
+            encabezados["Content-Encoding"] = codificacion
+        return flask.Response(cuerpo, content_type=self.tipo, headers=encabezados)
+
+
+def precalcular_rutas(app, rutas=RUTAS_PRECALCULADAS):
+    """Reemplaza las vistas de `rutas` por su respuesta serializada una vez.
+
+    Llamar después de definir app.layout y todos los callbacks. Un layout
+    dinámico (función) no se precalcula porque cambia en cada petición.
+    """
+    servidor = app.server
+    precalculadas = {}
+    for ruta in rutas:
+        if ruta == "_dash-layout" and callable(app.layout):
+            continue
+        endpoint = app.config.routes_pathname_prefix + ruta
+        vista = servidor.view_functions[endpoint]
+        with servidor.test_request_context():
+            original = vista()
+        respuesta = RespuestaPrecalculada(original.get_data(), original.content_type)
+        precalculadas[ruta] = respuesta
+        servidor.view_functions[endpoint] = _vista_precalculada(respuesta)
+    return precalculadas
+
+
+def _vista_precalculada(respuesta):
+    def vista():
+        return respuesta.responder(flask.request)
+    return vista
@@ -0,0 +1,142 @@
+"""Tabla CIE-10 completa con paginación, orden y filtro en el servidor.
+
+El DataTable del tablero usa page_action='custom': el navegador solo recibe
+la página visible. El catálogo (códigos de 3 y de 4 caracteres) se ordena
+una sola vez por código y por descripción; el orden por total se calcula
+una vez por cada selección de filtros (ordenes()). Cada página es entonces
+una máscara sobre un orden ya hecho y un corte, sin volver a ordenar.
+"""
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+import process
+
+COLUMNAS = [
+    {"name": "Código", "id": "codigo"},
+    {"name": "Descripción", "id": "descripcion"},
+    {"name": "Total de casos", "id": "total_casos", "type": "numeric"},
+]
+ORDEN_INICIAL = [{"column_id": "total_casos", "direction": "desc"}]
+
+# Una condición del filter_query del DataTable: {columna} operador valor
+_CONDICION = re.compile(r'\{(?P<columna>[^}]+)\}\s*(?P<operador>s=|=|!=|>=|<=|>|<|eq|ne|gt|ge|lt|le|contains)\s*(?P<valor>.+)')
+_COMPARACIONES = {
+    "=": np.equal, "s=": np.equal, "eq": np.equal, "!=": np.not_equal, "ne": np.not_equal,
+    ">": np.greater, "gt": np.greater, ">=": np.greater_equal, "ge": np.greater_equal,
+    "<": np.less, "lt": np.less, "<=": np.less_equal, "le": np.less_equal,
+}
+
+
+def catalogo(dimensiones):
+    """Códigos de 3 caracteres y sus hijos de 4 (si está la dimensión causas_detalle), ordenados por código."""
+    # Los códigos nulos (filas vacías del CSV) no entran al catálogo
+    tres = dimensiones["causas"].iloc[:, 0]
+    tres = tres[tres.index.notna()]
+    partes = [pd.DataFrame({"codigo": tres.index.astype(str), "descripcion": tres.to_numpy(dtype=object),
+                            "nivel": 3, "padre": None})]
+    if "causas_detalle" in dimensiones:
+        detalle = dimensiones["causas_detalle"]
+        detalle = detalle[detalle.index.notna()]
+        partes.append(pd.DataFrame({
+            "codigo": detalle.index.astype(str),
+            "descripcion": detalle["descripcion__de_codigos_mortalidad_a_cuatro_caracteres"].to_numpy(dtype=object),
+            "nivel": 4,
+            "padre": detalle["codigo_de_la_cie-10_tres_caracteres"].to_numpy(dtype=object)}))
+    return pd.concat(partes, ignore_index=True).sort_values("codigo", kind="stable", ignore_index=True)
+
+
+class TablaCausas:
+    """Catálogo CIE-10 con sus órdenes precalculados y la búsqueda de páginas."""
+
+    def __init__(self, catalogo):
+        self.codigo = catalogo["codigo"].to_numpy(dtype=object)
+        self.descripcion = catalogo["descripcion"].fillna("").to_numpy(dtype=object)
+        self.nivel = catalogo["nivel"].to_numpy()
+        self.padre = catalogo["padre"].to_numpy(dtype=object)
+        self.indice = pd.Index(self.codigo)
+        # Versiones en minúsculas para el filtro "contains", calculadas una sola vez
+        self._minusculas = {
+            "codigo": pd.Series(self.codigo).str.lower(),
+            "descripcion": pd.Series(self.descripcion).str.lower(),
+        }
+        self._ordenes = {}
+        for columna, valores in (("codigo", self.codigo), ("descripcion", self._minusculas["descripcion"].to_numpy())):
+            ascendente = np.argsort(valores, kind="stable")
+            self._ordenes[(columna, "asc")] = ascendente
+            self._ordenes[(columna, "desc")] = ascendente[::-1]
+
+    def __len__(self):
+        return len(self.codigo)
+
+    def totales(self, por_codigo):
+        """Total de cada fila del catálogo a partir de una Serie de totales indexada por cod_muerte.
+
+        Un código de 4 caracteres suma en su fila y en la de su código de 3; un
+        código de 3 caracteres solo en la suya.
+        """
+        codigos = pd.Index(por_codigo.index.astype(str))
+        valores = por_codigo.to_numpy(dtype=np.int64)
+        totales = np.zeros(len(self), dtype=np.int64)
+        exactos = self.indice.get_indexer(codigos)
+        cuatro = exactos >= 0
+        cuatro[cuatro] = self.nivel[exactos[cuatro]] == 4
+        np.add.at(totales, exactos[cuatro], valores[cuatro])
+        tres = self.indice.get_indexer(codigos.str[:3])
+        np.add.at(totales, tres[tres >= 0], valores[tres >= 0])
+        return totales
+
+    def ordenes(self, totales):
+        """Órdenes por columna para estos totales; los empates quedan en orden de código."""
+        ordenes = dict(self._ordenes)
+        ordenes[("total_casos", "asc")] = np.argsort(totales, kind="stable")
+        ordenes[("total_casos", "desc")] = np.argsort(-totales, kind="stable")
+        return ordenes
+
+    def filtrar(self, filtro, totales):
+        """Máscara de las filas que cumplen el filter_query del DataTable."""
+        mascara = np.ones(len(self), dtype=bool)
+        for condicion in filter(None, (c.strip() for c in (filtro or "").split(" && "))):
+            partes = _CONDICION.match(condicion)
+            if not partes or partes["columna"] not in ("codigo", "descripcion", "total_casos"):
+                continue  # Condición que no se entiende: no filtra
+            columna, operador = partes["columna"], partes["operador"]
+            valor = partes["valor"].strip().strip("\"'`")
+            # Las descripciones del catálogo ya no tienen tildes (process.normalizar_texto)
+            texto = process.quitar_tildes(valor).lower()
+            if columna == "total_casos":
+                try:
+                    numero = float(valor)
+                except ValueError:
+                    continue
+                comparar = _COMPARACIONES.get(operador, np.greater_equal if operador == "contains" else None)
+                mascara &= comparar(totales, numero)
+            elif operador == "contains":
+                mascara &= self._minusculas[columna].str.contains(texto, regex=False).to_numpy()
+            elif operador in _COMPARACIONES:
+                mascara &= _COMPARACIONES[operador](self._minusculas[columna].to_numpy(), texto)
+        return mascara
+
+    def pagina(self, totales, ordenes, padre=None, numero=0, tamano=10, orden_por=None, filtro=None):
+        """Filas de la página `numero` y el número total de páginas.
+
+        Sin `padre` se listan los códigos de 3 caracteres; con él, sus hijos de 4.
+        """
+        orden = (orden_por or ORDEN_INICIAL)[0]
+        indices = ordenes[(orden["column_id"], orden["direction"])]
+        mascara = (self.nivel == 3) if padre is None else (self.padre == padre)
+        if filtro:
+            mascara &= self.filtrar(filtro, totales)
+        seleccion = indices[mascara[indices]]
+        paginas = max(1, math.ceil(len(seleccion) / tamano))
+        # Si un filtro nuevo deja menos páginas, se muestra la última en vez de una vacía
+        numero = min(numero, paginas - 1)
+        corte = seleccion[numero * tamano:(numero + 1) * tamano]
+        filas = [{"id": self.codigo[i], "codigo": self.codigo[i], "descripcion": self.descripcion[i],
+                  "total_casos": int(totales[i])} for i in corte]
+        return filas, paginas
+
+    def tiene_hijos(self, codigo):
+        return bool(np.any(self.padre == codigo))
@@ -0,0 +1,28 @@
+"""Los GeoJSON de geo/ deben cubrir todos los departamentos de info/mapa.csv."""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import geometria
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def departamentos():
+    mapa = pd.read_csv(os.path.join(RAIZ, "info", "mapa.csv"), sep='|', encoding='latin1')
+    return set(mapa["departamento"])
+
+
+@pytest.mark.parametrize("nivel", list(geometria.NIVELES))
+def test_nivel_cubre_departamentos_del_mapa(nivel, departamentos):
+    with open(os.path.join(RAIZ, geometria.ruta_nivel(nivel)), encoding="utf-8") as f:
+        geojson = json.load(f)
+    nombres = {feature["properties"]["name"] for feature in geojson["features"]}
+    assert not departamentos - nombres, f"Departamentos sin geometría en {nivel}"
+    # Cada departamento conserva al menos un anillo cerrado tras simplificar
+    for feature in geojson["features"]:
+        for poligono in geometria._poligonos(feature["geometry"]):
+            assert poligono and all(len(anillo) >= 4 and anillo[0] == anillo[-1] for anillo in poligono)
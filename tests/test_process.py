@@ -0,0 +1,35 @@
+"""Agregados de process sobre cubos pequeños armados a mano."""
+import sqlite3
+
+import pandas as pd
+
+import base_sqlite
+import process
+
+COLUMNA_DESCRIPCION = 'descripcion__de_codigos_mortalidad_a_tres_caracteres'
+
+
+def test_tabla_suma_los_codigos_de_4_caracteres_en_su_categoria():
+    cubo = pd.DataFrame({'cod_muerte': ['X950', 'X951', 'X95', 'I10', 'J189', None],
+                         'total': [3, 2, 1, 4, 2, 7]})
+    dimensiones = {'causas': pd.DataFrame(
+        {COLUMNA_DESCRIPCION: ['Agresion con disparo', 'Hipertension esencial', 'Neumonia']},
+        index=pd.Index(['X95', 'I10', 'J18'], name='codigo_de_la_cie-10_tres_caracteres'))}
+    resultado = process.AGREGADOS['tabla'](cubo, dimensiones)
+    assert resultado['cod_muerte'].tolist() == ['X95', 'I10', 'J18']
+    assert resultado['total_casos'].tolist() == [6, 4, 2]
+
+
+def test_tabla_sqlite_suma_los_codigos_de_4_caracteres_en_su_categoria():
+    conexion = sqlite3.connect(':memory:')
+    conexion.execute('CREATE TABLE muertes (cod_muerte TEXT)')
+    conexion.executemany('INSERT INTO muertes VALUES (?)',
+                         [(codigo,) for codigo, veces in [('X950', 3), ('X951', 2), ('X95', 1), ('I10', 4), ('J189', 2)]
+                          for _ in range(veces)])
+    conexion.execute('CREATE TABLE causas ("codigo_de_la_cie-10_tres_caracteres" TEXT, '
+                     f'{COLUMNA_DESCRIPCION} TEXT)')
+    conexion.executemany('INSERT INTO causas VALUES (?, ?)', [
+        ('X95', 'Agresion con disparo'), ('I10', 'Hipertension esencial'), ('J18', 'Neumonia')])
+    resultado = base_sqlite.tabla(conexion, {}, '', [])
+    assert resultado['cod_muerte'].tolist() == ['X95', 'I10', 'J18']
+    assert resultado['total_casos'].tolist() == [6, 4, 2]